@@ -1,2 +1,5 @@
-from .fields import CountField, RelationField, SumField, AvgField  # noqa
-from .state import AbnormBlocker  # noqa
+from .fields import (  # noqa
+    CountField, RelationField, BinaryRelationField, JSONRelationField,
+    SumField, AvgField)
+from .state import AbnormBlocker, AbnormCache, AbnormDeferrer  # noqa
+from .managers import AbnormManager, AbnormQuerySet  # noqa
@@ -7,6 +7,13 @@ from .base import EveryDjango
 
 class SpecificDjango(EveryDjango):
 
+    # models.JSONField is available since django 3.1
+    JSONField = None
+
+    # whether querysets have async methods (`acount`, `aaggregate` etc),
+    # available since django 4.1
+    async_orm = False
+
     def __init__(self):
         self.hack_django_app_registry_once()
 
@@ -107,8 +114,16 @@ class SpecificDjango(EveryDjango):
                             return this_django.get_descriptor_rel_model(
                                 descriptor)
 
+                def __bool__(self):
+                    # unbound fields (e.g. migration state ones) are not
+                    # considered relations
+                    return self.model is not None
+
             field.remote_field = Rel()
 
+    def is_json_key_transform(self, expression):
+        return False
+
     def m2m_set(self, instance, relation_name, value):
         getattr(instance, relation_name).set(value)
 
@@ -132,6 +147,62 @@ class SpecificDjango(EveryDjango):
                 if self._is_matching_generic_foreign_key(descriptor.field, f)
             ][0].name
 
+    def get_descriptor_query_name(self, descriptor):
+        # name of the relation to be used within augmented model lookups
+        if isinstance(descriptor, self.ManyToManyDescriptor):
+            if descriptor.reverse:
+                return descriptor.field.related_query_name()
+            return descriptor.field.name
+        elif isinstance(
+                descriptor, self.ReverseGenericRelatedObjectsDescriptor):
+            return descriptor.field.name
+        elif isinstance(descriptor, self.ForeignRelatedObjectsDescriptor):
+            return descriptor.field.related_query_name()
+        raise Exception('dont know how to deal with descriptor of type %s'
+                        % descriptor)
+
+    def get_field_backwards_attnames(self, field):
+        # attnames of the related model fields, that hold a reference to the
+        # augmented model instance
+        descriptor = getattr(field.model, field.relation_name)
+        rf = self.get_descriptor_remote_field(descriptor)
+        from django.db.models.fields.related import ForeignKey
+        from django.contrib.contenttypes.fields import GenericRelation
+        if isinstance(rf, ForeignKey):
+            return (rf.attname,)
+        elif isinstance(rf, GenericRelation):
+            opts = self.get_descriptor_rel_model(descriptor)._meta
+            return (
+                opts.get_field(rf.content_type_field_name).attname,
+                opts.get_field(rf.object_id_field_name).attname,
+            )
+        # m2m relations are not referenced by related model fields
+        return ()
+
+    def get_field_backwards_object(self, field, values):
+        # get augmented model instance referenced by related model fields
+        # `values` (see `get_field_backwards_attnames`)
+        descriptor = getattr(field.model, field.relation_name)
+        rf = self.get_descriptor_remote_field(descriptor)
+        from django.db.models.fields.related import ForeignKey
+        from django.contrib.contenttypes.fields import GenericRelation
+        from django.contrib.contenttypes.models import ContentType
+        if isinstance(rf, ForeignKey):
+            value = values.get(rf.attname)
+            if value is None:
+                return None
+            return rf.remote_field.model._base_manager.filter(
+                **{rf.target_field.attname: value}).first()
+        elif isinstance(rf, GenericRelation):
+            ct_attname, fk_attname = self.get_field_backwards_attnames(field)
+            ct_id, fk_value = values.get(ct_attname), values.get(fk_attname)
+            if ct_id is None or fk_value is None:
+                return None
+            model = ContentType.objects.get_for_id(ct_id).model_class()
+            if model is None:
+                return None
+            return model._base_manager.filter(pk=fk_value).first()
+
     def _is_matching_generic_foreign_key(self, descriptor_field, field):
         """
         Return True if field is a GenericForeignKey whose content type and
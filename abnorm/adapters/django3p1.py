@@ -1,5 +1,12 @@
+from django.db import models
+
 from .django3p0 import SpecificDjango as Django3p0
 
 
 class SpecificDjango(Django3p0):
-    pass
+
+    JSONField = models.JSONField
+
+    def is_json_key_transform(self, expression):
+        from django.db.models.fields.json import KeyTransform
+        return isinstance(expression, KeyTransform)
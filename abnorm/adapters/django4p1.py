@@ -2,4 +2,5 @@ from .django4p0 import SpecificDjango as Django4p0
 
 
 class SpecificDjango(Django4p0):
-    pass
+
+    async_orm = True
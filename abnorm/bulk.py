@@ -0,0 +1,95 @@
+"""
+Set-based computation of abnorm aggregate fields for many augmented
+instances at once, bypassing per-instance signals
+"""
+from collections import OrderedDict
+
+from .adapters import this_django
+from .dispatch import has_foreign_receivers
+from .fields import post_update, post_bulk_update, write_values
+from . import state
+
+
+def is_bulk_updatable(field):
+    return field.get_aggregate() is not None
+
+
+def get_aggregate_values(model, fields, pks):
+    """
+    Returns {pk: {field name: value}} for aggregate `fields` of `model`
+    instances with `pks`, computed with a single grouped query per relation
+    """
+    groups = OrderedDict()
+    for field in fields:
+        groups.setdefault(field.relation_name, []).append(field)
+
+    result = {pk: {} for pk in pks}
+    for relation_name, group in groups.items():
+        descriptor = getattr(model, relation_name)
+        prefix = this_django.get_descriptor_query_name(descriptor) + '__'
+        aliases = ['abnorm%d' % i for i in range(len(group))]
+        rows = model._base_manager.filter(pk__in=pks).annotate(**{
+            alias: field.get_aggregate(prefix)
+            for alias, field in zip(aliases, group)
+        }).values_list('pk', *aliases)
+        for row in rows:
+            values = result[row[0]]
+            for field, value in zip(group, row[1:]):
+                values[field.name] = field.get_aggregate_value(value)
+    return result
+
+
+def update_aggregate_values(model, fields, pks, batch_size=None):
+    """
+    Recomputes aggregate `fields` of `model` instances with `pks` and writes
+    changed values with bulk UPDATE statements. Related models are informed
+    with `post_bulk_update` and `post_update` signals about changed
+    instances only.
+    Returns changed instances pks.
+    """
+    fields = list(fields)
+    pks = list(pks)
+    names = [field.name for field in fields]
+    new_values = get_aggregate_values(model, fields, pks)
+    current_values = model._base_manager.filter(
+        pk__in=pks).values_list('pk', *names)
+
+    changed = []
+    for row in current_values:
+        values = new_values[row[0]]
+        if any(values[name] != value for name, value in zip(names, row[1:])):
+            changed.append(model(pk=row[0], **values))
+    if not changed:
+        return []
+
+    model._base_manager.bulk_update(changed, names, batch_size=batch_size)
+    state.invalidate_cache(model)
+
+    changed_pks = [instance.pk for instance in changed]
+    with state.AbnormDeferrer():
+        post_bulk_update.send(sender=model, pks=changed_pks)
+        # abnorm handles `post_bulk_update` itself, so instances are loaded
+        # for other receivers only
+        if has_foreign_receivers(post_update, model):
+            for instance in model._base_manager.filter(pk__in=changed_pks):
+                post_update.send(sender=model, instance=instance, bulk=True)
+    return changed_pks
+
+
+def update_values(model, fields, pks, chunk_size=1000):
+    """
+    Recomputes `fields` of `model` instances with `pks`: aggregates are
+    computed in bulk, other fields - one instance at a time, with a single
+    UPDATE per instance
+    """
+    pks = list(pks)
+    bulk_fields = [f for f in fields if is_bulk_updatable(f)]
+    other_fields = [f for f in fields if f not in bulk_fields]
+    for i in range(0, len(pks), chunk_size):
+        chunk = pks[i:i + chunk_size]
+        if bulk_fields:
+            update_aggregate_values(model, bulk_fields, chunk)
+        if other_fields:
+            with state.AbnormDeferrer():
+                for instance in model._base_manager.filter(pk__in=chunk):
+                    write_values(instance, [(f, None) for f in other_fields])
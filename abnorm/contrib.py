@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Q
+from django.contrib.postgres.aggregates import ArrayAgg
 from django.contrib.postgres.fields import ArrayField
 
 from .fields import DenormalizedFieldMixin
@@ -8,6 +10,8 @@ class RelationValueSetField(DenormalizedFieldMixin, ArrayField):
 
     def __init__(self, *args, **kwargs):
         self.field_name = kwargs.pop('field_name', None)
+        # see `abnorm.triggers`
+        self.triggers = kwargs.pop('triggers', False)
         kwargs.setdefault('base_field', models.IntegerField())
         super(RelationValueSetField, self).__init__(*args, **kwargs)
 
@@ -23,6 +27,17 @@ class RelationValueSetField(DenormalizedFieldMixin, ArrayField):
         values = queryset.values_list(self.field_name, flat=True)
         return list(set(values))
 
+    def get_trigger_aggregate(self):
+        # empty relations are excluded the same way as above
+        relation = '__'.join(self.field_name.split('__')[:-1])
+        q = self.filter
+        if relation:
+            q &= Q(**{relation + '__isnull': False})
+        return ArrayAgg(self.field_name, distinct=True, filter=q or None)
+
+    def get_aggregate_value(self, value):
+        return list(value) if value is not None else []
+
     def deconstruct(self):
         # django 1.7+
         name, path, args, kwargs = super(
@@ -0,0 +1,101 @@
+from django.db.models.signals import pre_save
+from django.dispatch.dispatcher import _make_id
+
+from . import state
+from .utils import get_model_name
+
+
+# signals handled w/o coalescing updates, they don't trigger any
+UNCOALESCED_SIGNALS = (pre_save,)
+DISPATCH_UID = 'abnorm'
+
+
+def receive(signal, sender, **kwargs):
+    if state.SKIP_SIGNALS:
+        return
+    for handler in state.dispatch_table[(signal, sender)]:
+        handler(sender=sender, **kwargs)
+
+
+def receive_coalesced(signal, sender, **kwargs):
+    if state.SKIP_SIGNALS:
+        return
+    # these signals are sent on `sender` data writes
+    state.invalidate_cache(sender)
+    with state.AbnormCache(), state.coalesce_updates(sender):
+        for handler in state.dispatch_table[(signal, sender)]:
+            handler(sender=sender, **kwargs)
+
+
+def connect(signal, sender, handler):
+    """
+    Adds `handler` to the dispatch table, a single receiver per signal and
+    sender runs all the abnorm handlers
+    """
+    key = (signal, sender)
+    handlers = state.dispatch_table.get(key)
+    if handlers is None:
+        handlers = ()
+        signal.connect(
+            receive if signal in UNCOALESCED_SIGNALS else receive_coalesced,
+            sender=sender, weak=False, dispatch_uid=DISPATCH_UID)
+    if handler not in handlers:
+        state.dispatch_table[key] = handlers + (handler,)
+
+
+def has_foreign_receivers(signal, sender):
+    # whether receivers other than abnorm one (see `connect`) listen to
+    # `signal` sent by `sender`
+    sender_ids = (_make_id(sender), _make_id(None))
+    return any(
+        entry[0][0] != DISPATCH_UID and entry[0][1] in sender_ids
+        for entry in signal.receivers)
+
+
+class RelationDispatcher(object):
+    """
+    Keeps abnorm fields sharing the same relation, so their values are
+    computed at once
+    """
+
+    def __init__(self):
+        self.fields = []
+
+    def add_field(self, field):
+        # augmented model pre_save is handled for all the fields at once
+        if not self.fields:
+            self.connect(pre_save, field.model, self.augmented_model_pre_save)
+        self.fields.append(field)
+
+    def connect(self, signal, sender, handler):
+        connect(signal, sender, handler)
+
+    def augmented_model_pre_save(self, sender, instance, **kwargs):
+        from .fields import get_denormalized_values
+        if instance.pk:
+            values = get_denormalized_values(instance, self.fields)
+            for name, value in values.items():
+                setattr(instance, name, value)
+
+
+def get_relation_dispatcher(field):
+    key = (get_model_name(field.model), field.relation_name)
+    dispatcher = state.dispatchers.get(key)
+    if dispatcher is None:
+        dispatcher = state.dispatchers[key] = RelationDispatcher()
+    return dispatcher
+
+
+def get_dependent_fields(model):
+    """
+    Returns {(augmented model, relation name): fields} for abnorm fields
+    computed over `model` instances
+    """
+    concrete_model = model._meta.concrete_model
+    result = {}
+    for dispatcher in list(state.dispatchers.values()):
+        for field in dispatcher.fields:
+            if field.rel_model._meta.concrete_model is concrete_model:
+                key = (field.model, field.relation_name)
+                result.setdefault(key, []).append(field)
+    return result
@@ -1,22 +1,38 @@
-import types
-
+import asyncio
+import json
+import sys
+import threading
+from collections import OrderedDict
+from decimal import Decimal
 from functools import wraps, partial
 
+from django.apps import apps
 from django.conf import settings
-from django.db import models
-from django.db.models import Sum, Avg, Q
+from django.db import models, connections, router
+from django.db.models import Count, Sum, Avg, Q, F, Value, Func
+from django.db.models.expressions import Col
+from django.db.models.functions import Coalesce
 from django.db.models.fields.files import FieldFile
 from django.db.models.signals import (
-    pre_save, post_save, post_delete, post_init, m2m_changed, Signal)
-from django.utils.functional import cached_property
-from django.core.exceptions import ObjectDoesNotExist
+    pre_save, post_save, post_delete, m2m_changed, Signal)
+from django.utils.functional import cached_property, SimpleLazyObject, empty
+from django.core.exceptions import ObjectDoesNotExist, ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
 
 from .adapters import this_django
-from .utils import get_model_name, dumps, loads
+from .dispatch import connect, get_relation_dispatcher
+from .serializers import get_serializer
+from .tasks import enqueue_update
+from .utils import (
+    get_model_name, prefix_q, iter_q_lookups, get_local_field,
+    is_single_valued_lookup, chunks, Descending)
 from . import state
 
 
 post_update = Signal()
+# sent once for instances updated in bulk, with their `pks`, `post_update`
+# is sent for each of them as well with `bulk=True`
+post_bulk_update = Signal()
 
 
 def skippable(func):
@@ -28,21 +44,433 @@ def skippable(func):
     return wrapper
 
 
-def init_model(model, data):
-    field_data = {}
+def sync_to_async(func):
+    # asgiref is not a dependency of django 2.2
+    from asgiref.sync import sync_to_async
+    return sync_to_async(func)
+
+
+def group_fields(fields):
+    """
+    Returns `fields` computed separately and groups of aggregates over the
+    same relation, which are computed with a single query
+    """
+    single = []
+    aggregated = OrderedDict()
+    for field in fields:
+        if field.get_aggregate() is not None:
+            aggregated.setdefault(field.relation_name, []).append(field)
+        else:
+            single.append(field)
+    groups = []
+    for group in aggregated.values():
+        if len(group) == 1:
+            single.extend(group)
+        else:
+            groups.append(group)
+    return single, groups
+
+
+def get_group_aggregates(group):
+    # not using field names as aliases to avoid clashes with related model
+    # fields
+    return {
+        'abnorm%d' % i: field.get_aggregate()
+        for i, field in enumerate(group)
+    }
+
+
+def get_group_values(group, result):
+    return {
+        field.name: field.get_aggregate_value(result['abnorm%d' % i])
+        for i, field in enumerate(group)
+    }
+
+
+def get_denormalized_values(augmented_instance, fields):
+    """
+    Returns {field name: value} for `fields`, aggregates over the same
+    relation are computed with a single query
+    """
+    single, groups = group_fields(fields)
+    # fields sharing related items take them from the widest ones (see
+    # `RelationFieldMixin.get_related_items`)
+    single.sort(key=lambda field: field.items_priority)
+    values = {
+        field.name: field.get_cached_value(augmented_instance)
+        for field in single
+    }
+    for group in groups:
+        values.update(get_cached_group_values(augmented_instance, group))
+    return values
+
+
+def get_cached_group_values(augmented_instance, group):
+    relation = getattr(augmented_instance, group[0].relation_name)
+
+    def compute():
+        return get_group_values(
+            group, relation.aggregate(**get_group_aggregates(group)))
+
+    models = [field.cache_models for field in group]
+    if None in models or augmented_instance.pk is None:
+        return compute()
+    return state.get_cached(
+        (tuple(group), augmented_instance.pk), set().union(*models),
+        compute)
+
+
+async def aget_group_values(augmented_instance, group):
+    relation = getattr(augmented_instance, group[0].relation_name)
+    aggregates = get_group_aggregates(group)
+    if this_django.async_orm:
+        result = await relation.aaggregate(**aggregates)
+    else:
+        result = await sync_to_async(relation.aggregate)(**aggregates)
+    return get_group_values(group, result)
+
+
+async def aget_denormalized_values(augmented_instance, fields):
+    """
+    Async counterpart of `get_denormalized_values`, values are computed
+    concurrently
+    """
+    single, groups = group_fields(fields)
+    results = await asyncio.gather(*(
+        [field.aget_denormalized_value(augmented_instance)
+         for field in single] +
+        [aget_group_values(augmented_instance, group) for group in groups]
+    ))
+    values = {
+        field.name: value for field, value in zip(single, results)}
+    for group_values in results[len(single):]:
+        values.update(group_values)
+    return values
+
+
+def get_incremented_values(augmented_instance, updates):
+    """
+    Returns UPDATE statement values for incremental `updates` and the fields
+    requiring full recomputation
+    """
+    values = {}
+    recomputed = []
+    for field, increment in updates:
+        value = None
+        if increment is not None:
+            value = field.get_incremented_value(augmented_instance, increment)
+        if value is None:
+            recomputed.append(field)
+        else:
+            values[field.name] = value
+    return values, recomputed
+
+
+def get_prep_values(fields, values):
+    return {field.name: field.get_prep_value(values[field.name])
+            for field in fields}
+
+
+def write_values(augmented_instance, updates):
+    """
+    Writes abnorm fields `updates` - (field, increment) pairs, where
+    `increment` is None for full recomputation - with a single UPDATE and
+    informs related models about it
+    """
+    values, recomputed = get_incremented_values(augmented_instance, updates)
+    values.update(get_prep_values(
+        recomputed, get_denormalized_values(augmented_instance, recomputed)))
+
+    # base manager is used, as abnorm aware ones (see `AbnormManager`) would
+    # recompute dependent fields, which are handled with `post_update`
+    augmented_model = augmented_instance._meta.model
+    augmented_model._base_manager.filter(
+        pk=augmented_instance.pk).update(**values)
+    state.invalidate_cache(augmented_model)
+
+    # inform related models it's been updated
+    post_update.send(
+        sender=type(augmented_instance),
+        instance=augmented_instance,
+    )
+
+
+async def awrite_values(augmented_instance, updates):
+    """
+    Async counterpart of `write_values`, `post_update` is left to the caller
+    (see `state.aperform_deferred_updates`)
+    """
+    values, recomputed = await sync_to_async(get_incremented_values)(
+        augmented_instance, updates)
+    computed = await aget_denormalized_values(augmented_instance, recomputed)
+    values.update(await sync_to_async(get_prep_values)(recomputed, computed))
+
+    augmented_model = augmented_instance._meta.model
+    queryset = augmented_model._base_manager.filter(pk=augmented_instance.pk)
+    if this_django.async_orm:
+        await queryset.aupdate(**values)
+    else:
+        await sync_to_async(queryset.update)(**values)
+    state.invalidate_cache(augmented_model)
+
+
+def get_tracked_values(instance, attnames):
+    # deferred fields are left out
+    data = instance.__dict__
+    return {attname: data[attname] for attname in attnames if attname in data}
+
+
+def get_concrete_attnames(model, names):
+    # attnames of concrete fields given by names or attnames
+    names = set(names)
+    return {
+        f.attname for f in model._meta.concrete_fields
+        if f.name in names or f.attname in names}
+
+
+@skippable
+def store_previous_values(sender, instance, raw=False, **kwargs):
+    # original values of the tracked fields are shared by all abnorm fields
+    # via `_abnorm_prev` attr, so there's no need to query the db for them
+    attnames = state.tracked_attnames[sender]
+    complete = False
+    if instance._state.adding and instance.pk is None:
+        prev_values = None
+    else:
+        prev_values = {}
+        # the snapshot may be stale if the previous save didn't complete
+        if (not instance._state.adding and
+                not getattr(instance, '_abnorm_saving', False)):
+            prev_values.update(getattr(instance, '_abnorm_snapshot', {}))
+        missing = [a for a in attnames if a not in prev_values]
+        complete = not missing
+        if missing:
+            db_values = sender._base_manager.filter(
+                pk=instance.pk).values(*missing).first()
+            if db_values is None:
+                prev_values = None
+            else:
+                prev_values.update(db_values)
+    instance._abnorm_prev = prev_values
+    # whether saved changes can be told by the snapshot (see `is_changed`)
+    instance._abnorm_prev_complete = complete
+    instance._abnorm_saving = True
+
+
+@skippable
+def take_instance_snapshot(sender, instance, raw=False, update_fields=None,
+                           **kwargs):
+    # the snapshot is taken only after a successful write, values which
+    # weren't saved keep their original ones
+    attnames = state.tracked_attnames[sender]
+    if update_fields is not None:
+        attnames = attnames & get_concrete_attnames(sender, update_fields)
+    snapshot = instance.__dict__.setdefault('_abnorm_snapshot', {})
+    snapshot.update(get_tracked_values(instance, attnames))
+    instance._abnorm_saving = False
+
+
+def patch_from_db(model):
+    # instances loaded from db keep tracked fields original values, it's
+    # cheaper than `post_init` receiver, which runs for every instance. The
+    # method is patched once per model class
+    original = model.from_db
+    if getattr(original, 'abnorm_patched', False):
+        return
+
+    @wraps(original)
+    def from_db(cls, db, field_names, values):
+        instance = original.__func__(cls, db, field_names, values)
+        attnames = state.tracked_attnames.get(cls)
+        if attnames and not state.SKIP_SIGNALS:
+            instance._abnorm_snapshot = get_tracked_values(instance, attnames)
+        return instance
+
+    from_db.abnorm_patched = True
+    model.from_db = classmethod(from_db)
+
+
+def patch_refresh_from_db(model):
+    # refreshed values replace the original ones, e.g. after a queryset
+    # `update()`. The method is patched once per model class
+    original = model.refresh_from_db
+    if getattr(original, 'abnorm_patched', False):
+        return
+
+    @wraps(original)
+    def refresh_from_db(self, using=None, fields=None, *args, **kwargs):
+        original(self, using, fields, *args, **kwargs)
+        attnames = state.tracked_attnames.get(type(self))
+        if not attnames or state.SKIP_SIGNALS:
+            return
+        if fields is not None:
+            attnames = attnames & get_concrete_attnames(type(self), fields)
+        snapshot = self.__dict__.setdefault('_abnorm_snapshot', {})
+        snapshot.update(get_tracked_values(self, attnames))
+
+    refresh_from_db.abnorm_patched = True
+    model.refresh_from_db = refresh_from_db
+
+
+def track_instance_state(model, attnames):
+    tracked_attnames = state.tracked_attnames.setdefault(model, set())
+    tracked_attnames.update(attnames)
+    patch_from_db(model)
+    patch_refresh_from_db(model)
+    connect(pre_save, model, store_previous_values)
+    connect(post_save, model, take_instance_snapshot)
+
+
+# types json values come in, `to_python` is a no-op for them
+NATIVE_TYPES = {
+    'AutoField': (int,),
+    'BigAutoField': (int,),
+    'SmallAutoField': (int,),
+    'IntegerField': (int,),
+    'BigIntegerField': (int,),
+    'SmallIntegerField': (int,),
+    'PositiveIntegerField': (int,),
+    'PositiveBigIntegerField': (int,),
+    'PositiveSmallIntegerField': (int,),
+    'BooleanField': (bool,),
+    'NullBooleanField': (bool,),
+    'CharField': (str,),
+    'TextField': (str,),
+    'SlugField': (str,),
+    'EmailField': (str,),
+    'URLField': (str,),
+    'DecimalField': (Decimal,),
+}
+
+
+def get_init_plan(model, names=None):
+    # [(data key, attname, field, types that don't require `to_python`)],
+    # data is keyed by field `names` or attnames
+    plan = []
     for f in model._meta.fields:
-        if f.attname in data:
-            field_data[f.attname] = f.to_python(data[f.attname])
+        if names is None or f.attname in names:
+            key = f.attname
+        elif f.name in names:
+            key = f.name
+        elif f.primary_key and 'pk' in names:
+            key = 'pk'
+        else:
+            continue
+        native_types = ()
+        if not isinstance(f, DenormalizedFieldMixin):
+            internal_type = (
+                f.target_field if f.is_relation else f).get_internal_type()
+            native_types = NATIVE_TYPES.get(internal_type, ())
+        plan.append((key, f.attname, f, native_types))
+    return plan
+
+
+def init_model(model, data, plan=None):
+    if plan is None:
+        plan = get_init_plan(model)
+    field_data = {}
+    for key, attname, f, native_types in plan:
+        if key in data:
+            value = data[key]
+            if value is not None and type(value) not in native_types:
+                value = f.to_python(value)
+            field_data[attname] = value
     instance = model(**field_data)
     return instance
 
 
+class LazyRelationValue(SimpleLazyObject):
+    """
+    Raw db value of a RelationField, deserialized on first use
+    """
+
+    def __init__(self, field, raw):
+        self.__dict__['raw'] = raw
+        super(LazyRelationValue, self).__init__(
+            partial(field.deserialize_value, raw))
+
+    def unwrap(self):
+        if self._wrapped is empty:
+            self._setup()
+        return self._wrapped
+
+
+class RelationCol(Col):
+    """
+    RelationField column, its values are deserialized lazily only when they
+    are loaded into model instances
+    """
+
+    lazy = False
+
+    def select_format(self, compiler, sql, params):
+        # `values()` queries select listed columns instead of default ones
+        self.lazy = compiler.query.default_cols
+        return super(RelationCol, self).select_format(compiler, sql, params)
+
+
+class RelationFieldDescriptor(object):
+    """
+    Replaces values loaded from db with deserialized ones on first access
+    """
+
+    def __init__(self, field):
+        self.field = field
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        data = instance.__dict__
+        attname = self.field.attname
+        if attname not in data:
+            # deferred field
+            instance.refresh_from_db(fields=[attname])
+        value = data[attname]
+        if type(value) is LazyRelationValue:
+            value = data[attname] = value.unwrap()
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+
+def patch_prepare_database_save(model):
+    # see `django.db.models.sql.compiler.SQLUpdateCompiler.as_sql` for
+    # details, model instances are serialized by abnorm fields when used as
+    # update values. The method is patched once per model class
+    original = model.prepare_database_save
+    if getattr(original, 'abnorm_patched', False):
+        return
+
+    @wraps(original)
+    def prepare_database_save(self, field):
+        if not isinstance(field, DenormalizedFieldMixin):
+            return original(self, field)
+        return field.get_prep_value(self)
+
+    prepare_database_save.abnorm_patched = True
+    model.prepare_database_save = prepare_database_save
+
+
 class DenormalizedFieldMixin(object):
+    # django 4.1+ doesn't alter db columns on changes of these
+    non_db_attrs = getattr(models.Field, 'non_db_attrs', ()) + ('qs_filter',)
+    # whether the value is maintained by database triggers (see `triggers`)
+    triggers = False
+    # whether related model changes are applied to the stored value instead
+    # of its recomputation (see `get_incremented_value`)
+    incremental = False
+    # guards `increments_count` of all the fields
+    increments_lock = threading.Lock()
+
     def __init__(self, relation_name=None, null=True, blank=True,
-                 qs_filter=None, **kwargs):
+                 qs_filter=None, asynchronous=None, **kwargs):
         if not relation_name:
             raise ValueError('relation_name cannot be empty.')
         self.relation_name = relation_name
+        # whether related data changes are handled by `tasks` backend,
+        # `ABNORM_ASYNC` setting is used by default
+        self.asynchronous = asynchronous
         if qs_filter is None:
             self.filter = Q()
         elif isinstance(qs_filter, dict):
@@ -67,12 +495,16 @@ class DenormalizedFieldMixin(object):
             attr = getattr(self, attr_name)
             if attr:
                 kwargs[attr_name] = attr
+        if self.filter:
+            kwargs['qs_filter'] = self.filter
         return name, path, args, kwargs
 
     def contribute_to_class(self, cls, name, *args, **kwargs):
         super(DenormalizedFieldMixin, self).contribute_to_class(
             cls, name, *args, **kwargs)
-        if not self.model._meta.abstract and not state.SKIP_SIGNALS:
+        # historical models (see migrations) have their own apps registry
+        if (not self.model._meta.abstract and not state.SKIP_SIGNALS and
+                cls._meta.apps is apps):
             if ((get_model_name(self.model), self.name)
                     not in state.signals_connected):
                 state.delayed_setup_signals.append((cls, self))
@@ -80,32 +512,134 @@ class DenormalizedFieldMixin(object):
     def get_denormalized_value(self, instance=None, relation=None):
         raise NotImplementedError('')
 
+    # fields with less priority are computed first within an instance
+    items_priority = 0
+
+    @cached_property
+    def cache_models(self):
+        """
+        Returns models writes to which affect the value (see
+        `state.AbnormCache`), None if they can't be determined
+        """
+        if self.dependency_fields is None:
+            return None
+        models = {self.rel_model}
+        descriptor = getattr(self.model, self.relation_name)
+        if isinstance(descriptor, this_django.ManyToManyDescriptor):
+            models.add(descriptor.through)
+        return models
+
+    def get_computed_value(self, instance):
+        # value written on recomputation, an equivalent of
+        # `get_denormalized_value` one, which may be cheaper to compute
+        return self.get_denormalized_value(instance)
+
+    def get_cached_value(self, instance):
+        # `get_computed_value` shared within `state.AbnormCache` block
+        if self.cache_models is None or instance.pk is None:
+            return self.get_computed_value(instance)
+        return state.get_cached(
+            (self, instance.pk), self.cache_models,
+            partial(self.get_computed_value, instance))
+
+    async def aget_denormalized_value(self, instance=None, relation=None):
+        # overridden for querysets with async methods
+        return await sync_to_async(self.get_denormalized_value)(
+            instance, relation)
+
+    def get_aggregate(self, prefix=''):
+        # aggregate expression to compute the value along with other fields
+        # over the same relation (see `get_denormalized_values`), if any.
+        # `prefix` makes it relative to the augmented model (see `bulk`)
+        return None
+
+    def get_aggregate_value(self, value):
+        return value
+
+    def get_trigger_aggregate(self):
+        # aggregate expression computing the value within database triggers
+        # (see `triggers`), None if they can't maintain it
+        return self.get_aggregate()
+
+    def pre_save(self, model_instance, add):
+        if self.triggers and not add:
+            # the value maintained by triggers is kept intact on save, the
+            # instance one may be stale
+            return F(self.attname)
+        return super(DenormalizedFieldMixin, self).pre_save(
+            model_instance, add)
+
     def get_related_queryset(self, instance=None, relation=None):
         if relation is None:
             relation = getattr(instance, self.relation_name)
         return relation.filter(self.filter)
 
-    def patch_instance_prepare_database_save(self, sender, instance, **kwargs):
-        # see `django.db.models.sql.compiler.SQLUpdateCompiler.as_sql` for
-        # details
-        if hasattr(instance, '_prepare_database_save'):
-            return
+    @cached_property
+    def rel_model(self):
+        descriptor = getattr(self.model, self.relation_name)
+        return this_django.get_descriptor_rel_model(descriptor)
+
+    @cached_property
+    def backwards_attnames(self):
+        return this_django.get_field_backwards_attnames(self)
+
+    def get_dependency_lookups(self):
+        # related model lookups the value depends on
+        return list(self.backwards_attnames) + list(
+            iter_q_lookups(self.filter))
 
-        def prepare_database_save(self, field):
-            if not isinstance(field, DenormalizedFieldMixin):
-                return self._prepare_database_save(field)
-            return field.get_prep_value(self)
+    @cached_property
+    def dependency_fields(self):
+        # related model fields changes of which affect the value, None if
+        # they can't be determined (e.g. lookups spanning other models)
+        lookups = self.get_dependency_lookups()
+        if lookups is None:
+            return None
+        fields = []
+        for lookup in lookups:
+            field = get_local_field(self.rel_model, lookup)
+            if field is None:
+                return None
+            if field not in fields:
+                fields.append(field)
+        return fields
 
-        instance._prepare_database_save = instance.prepare_database_save
-        instance.prepare_database_save = types.MethodType(
-            prepare_database_save, instance)
+    @cached_property
+    def depends_on_abnorm_fields(self):
+        # whether related model abnorm fields updates (see `post_update`)
+        # affect the value
+        fields = self.dependency_fields
+        return fields is None or any(
+            isinstance(field, DenormalizedFieldMixin) for field in fields)
+
+    def get_tracked_attnames(self):
+        # related model fields original values of which are required to
+        # handle its changes, abnorm fields are considered changed on every
+        # save (see `is_changed`)
+        attnames = tuple(self.backwards_attnames)
+        for field in self.dependency_fields or ():
+            if (field.attname not in attnames and
+                    not isinstance(field, DenormalizedFieldMixin)):
+                attnames += (field.attname,)
+        return attnames
+
+    @property
+    def dispatcher(self):
+        return get_relation_dispatcher(self)
 
     def connect_related_model_signals(self, model):
-        post_init.connect(
-            self.patch_instance_prepare_database_save, sender=model)
-        pre_save.connect(self.related_model_pre_save, sender=model)
-        post_save.connect(self.related_model_post_save, sender=model)
-        post_delete.connect(self.related_model_post_delete, sender=model)
+        patch_prepare_database_save(model)
+        track_instance_state(model, self.get_tracked_attnames())
+        if self.incremental:
+            self.dispatcher.connect(
+                post_save, model, self.related_model_post_save_increment)
+            self.dispatcher.connect(
+                post_delete, model, self.related_model_post_delete_increment)
+        else:
+            self.dispatcher.connect(
+                post_save, model, self.related_model_post_save)
+            self.dispatcher.connect(
+                post_delete, model, self.related_model_post_delete)
 
     def setup_signals(self, cls):
         if cls._meta.abstract:
@@ -115,7 +649,10 @@ class DenormalizedFieldMixin(object):
                 settings, 'ABNORM_IGNORE_MODELS', []):
             return
 
-        pre_save.connect(self.augmented_model_pre_save, cls)
+        if self.triggers:
+            return
+
+        self.dispatcher.add_field(self)
 
         descriptor = getattr(cls, self.relation_name)
         rel_model = this_django.get_descriptor_rel_model(descriptor)
@@ -128,9 +665,9 @@ class DenormalizedFieldMixin(object):
 
         descriptor_field = this_django.get_descriptor_remote_field(descriptor)
         if is_m2md:
-            post_init.connect(
-                self.patch_instance_prepare_database_save, sender=rel_model)
-            m2m_changed.connect(self.m2m_changed, sender=descriptor.through)
+            patch_prepare_database_save(rel_model)
+            self.dispatcher.connect(
+                m2m_changed, descriptor.through, self.m2m_changed)
         elif is_frod:
             # patch nullable FK and One2One fields
             #: see AbnormForeignRelatedObjectsDescriptor comments
@@ -154,7 +691,8 @@ class DenormalizedFieldMixin(object):
         else:
             related_field_name = descriptor_field.name
 
-        if related_field_name and related_field_name != '+':
+        if (related_field_name and related_field_name != '+' and
+                self.depends_on_abnorm_fields):
             # if backwards relation name is not disabled, sign current
             # instance to update *current* field parent, see
             # https://docs.djangoproject.com/en/stable/ref/models/fields/
@@ -167,8 +705,12 @@ class DenormalizedFieldMixin(object):
                     not descriptor.reverse):
                 post_update_model = self.model
 
-            # local functions are garbage collected, so disable weak refs
-            post_update.connect(receiver, sender=post_update_model, weak=False)
+            self.dispatcher.connect(post_update, post_update_model, receiver)
+            self.dispatcher.connect(
+                post_bulk_update, rel_model,
+                self.related_model_post_bulk_update)
+            state.add_cascade_dependency(post_update_model, self.model)
+            state.add_cascade_dependency(rel_model, self.model)
 
         if is_frod or is_m2md:
             # required for all descriptor types with django 1.6-1.8 for some
@@ -177,25 +719,65 @@ class DenormalizedFieldMixin(object):
 
         state.signals_connected.append((get_model_name(self.model), self.name))
 
-    @skippable
-    def augmented_model_pre_save(self, sender, instance, **kwargs):
-        if instance.pk:
-            setattr(instance, self.name, self.get_denormalized_value(instance))
+    def get_previous_value(self, instance, attname, default=None):
+        # see `store_previous_values`
+        prev_values = getattr(instance, '_abnorm_prev', None) or {}
+        return prev_values.get(attname, default)
+
+    def is_relation_changed(self, instance):
+        prev_values = getattr(instance, '_abnorm_prev', None)
+        if prev_values is None:
+            return False
+        return any(
+            prev_values.get(attname) != getattr(instance, attname)
+            for attname in self.backwards_attnames
+        )
 
-    @skippable
-    def related_model_pre_save(self, sender, instance, raw=False, using=None,
-                               update_fields=None, **kwargs):
-        # need original field value to track changed relations
-        db_instance = type(instance)._base_manager.filter(
-            pk=instance.pk).first()
-        if db_instance:
-            prev_value = getattr(db_instance, self.backwards_name)
-            setattr(instance, '_%s_prev' % self.backwards_name, prev_value)
+    def get_previous_relation(self, instance):
+        if not self.is_relation_changed(instance):
+            return None
+        return this_django.get_field_backwards_object(
+            self, instance._abnorm_prev)
+
+    def is_changed(self, instance, update_fields=None):
+        # whether saving existing related `instance` may affect the value
+        fields = self.dependency_fields
+        if fields is None:
+            return True
+        if update_fields is not None:
+            return any(
+                f.name in update_fields or f.attname in update_fields
+                for f in fields)
+        prev_values = getattr(instance, '_abnorm_prev', None)
+        if (prev_values is None or
+                not getattr(instance, '_abnorm_prev_complete', False)):
+            # the snapshot is missing or may be stale, so nothing is
+            # filtered out
+            return True
+        for field in fields:
+            if field.primary_key:
+                # unknown yet when created instance snapshot is taken, saving
+                # with another pk writes another row anyway
+                continue
+            if field.attname not in instance.__dict__:
+                # deferred, so it's not saved
+                continue
+            if (field.attname not in prev_values or
+                    prev_values[field.attname] != getattr(
+                        instance, field.attname)):
+                return True
+        return False
 
     @skippable
     def related_model_post_save(self, sender, instance, created, raw=False,
                                 using=None, update_fields=None, **kwargs):
-        # TODO: consider update_fields value
+        if not created:
+            if not self.is_changed(instance, update_fields):
+                return
+            #: relation changed case
+            prev_relation = self.get_previous_relation(instance)
+            if prev_relation is not None:
+                self.update_value(prev_relation)
         self.update_value_by(instance)
 
     @skippable
@@ -205,18 +787,47 @@ class DenormalizedFieldMixin(object):
     @skippable
     def m2m_changed(self, sender, instance, action, reverse=False,
                     model=None, pk_set=None, using=None, **kwargs):
-        if action in ('post_add', 'post_remove', 'post_clear'):
-            self.update_value(instance)
+        if isinstance(instance, self.model):
+            if action in ('post_add', 'post_remove', 'post_clear'):
+                self.update_value(instance)
+            return
+
+        # changed from the related model side, so `pk_set` holds augmented
+        # instances pks, which are unknown once the relation is cleared
+        if action == 'pre_clear':
+            cleared_pks = instance.__dict__.setdefault(
+                '_abnorm_cleared_pks', {})
+            cleared_pks[self] = list(getattr(
+                instance, self.backwards_name).values_list('pk', flat=True))
+        elif action == 'post_clear':
+            self.update_values(instance.__dict__.get(
+                '_abnorm_cleared_pks', {}).pop(self, ()))
+        elif action in ('post_add', 'post_remove'):
+            self.update_values(pk_set)
 
     def get_post_update_receiver(self, related_field):
         @skippable
-        def post_update_receiver(sender, instance, **kwargs):
+        def post_update_receiver(sender, instance, bulk=False, **kwargs):
+            if bulk:
+                # see `related_model_post_bulk_update`
+                return
             related_instance = getattr(instance, related_field)
             if related_instance is not None:
                 self.update_value(related_instance)
 
         return post_update_receiver
 
+    @skippable
+    def related_model_post_bulk_update(self, sender, pks, **kwargs):
+        descriptor = getattr(self.model, self.relation_name)
+        lookup = this_django.get_descriptor_query_name(descriptor) + '__in'
+        affected = set()
+        for chunk in chunks(pks):
+            affected.update(self.model._base_manager.filter(**{
+                lookup: chunk
+            }).values_list('pk', flat=True))
+        self.update_values(affected)
+
     def update_value_by(self, related_instance):
         try:
             augmented_instance = getattr(
@@ -232,69 +843,236 @@ class DenormalizedFieldMixin(object):
             # Have nothing to do with such broken refs, just exit.
             return
 
-        instances = (
-            augmented_instance.all()
-            if isinstance(augmented_instance, models.Manager)
-            else [augmented_instance]
-        )
+        if isinstance(augmented_instance, models.Manager):
+            # many instances may be affected, so they are updated in bulk
+            self.update_values(
+                augmented_instance.values_list('pk', flat=True))
+        else:
+            self.update_value(augmented_instance)
 
-        for instance in instances:
-            self.update_value(instance)
+    @property
+    def is_asynchronous(self):
+        if self.asynchronous is None:
+            return getattr(settings, 'ABNORM_ASYNC', False)
+        return self.asynchronous
 
     def update_value(self, augmented_instance):
         if not isinstance(augmented_instance, self.model):
             return
-        value = self.get_prep_value(
-            self.get_denormalized_value(augmented_instance))
-        augmented_model = augmented_instance._meta.model
-        augmented_model.objects.filter(pk=augmented_instance.pk).update(
-            **{self.name: value})
-
-        # inform related models it's been updated
-        post_update.send(
-            sender=type(augmented_instance),
-            instance=augmented_instance,
-        )
+        if self.is_asynchronous:
+            enqueue_update(self, [augmented_instance.pk])
+        elif not state.defer_update(self, augmented_instance):
+            write_values(augmented_instance, [(self, None)])
+
+    async def aupdate_value(self, augmented_instance):
+        """
+        Async counterpart of `update_value`, dependent fields are updated
+        with async ORM as well
+        """
+        if not isinstance(augmented_instance, self.model):
+            return
+        if self.is_asynchronous:
+            await sync_to_async(enqueue_update)(
+                self, [augmented_instance.pk])
+            return
+        async with state.AbnormDeferrer():
+            state.defer_update(self, augmented_instance)
+
+    def update_values(self, pks):
+        from .bulk import update_values
+        pks = set(pks)
+        if not pks:
+            return
+        if self.is_asynchronous:
+            enqueue_update(self, pks)
+        elif not state.defer_bulk_update(self, pks):
+            update_values(self.model, [self], pks)
+
+    def get_incremented_value(self, augmented_instance, increment):
+        """
+        Returns UPDATE statement value applying `increment` (a change made
+        by related instances) to the stored value of `augmented_instance`,
+        None means full recomputation is required
+        """
+        raise NotImplementedError('')
+
+    def get_increment(self, related_instance):
+        # a change made by adding `related_instance` to the relation
+        raise NotImplementedError('')
+
+    def get_removal_increment(self, related_instance, previous=False):
+        # a change made by removing `related_instance` from the relation, as
+        # of its previous save if `previous`
+        raise NotImplementedError('')
+
+    def get_change_increment(self, related_instance):
+        # a change made by saving `related_instance` staying in the relation
+        raise NotImplementedError('')
+
+    @skippable
+    def related_model_post_save_increment(self, sender, instance, created,
+                                          **kwargs):
+        try:
+            relation = getattr(instance, self.backwards_name)
+        except ObjectDoesNotExist:
+            return
+        if isinstance(relation, models.Manager):
+            # many to many relations are not tracked incrementally
+            return self.related_model_post_save(
+                sender, instance, created, **kwargs)
+
+        if created:
+            self.increment_value(relation, self.get_increment(instance))
+            return
+        if not self.is_changed(instance, kwargs.get('update_fields')):
+            return
+        if getattr(instance, '_abnorm_prev', None) is None:
+            # nothing is known about previous state
+            return self.update_value_by(instance)
+
+        if self.is_relation_changed(instance):
+            prev_relation = self.get_previous_relation(instance)
+            if prev_relation is not None:
+                self.increment_value(
+                    prev_relation,
+                    self.get_removal_increment(instance, previous=True))
+            self.increment_value(relation, self.get_increment(instance))
+        else:
+            self.increment_value(
+                relation, self.get_change_increment(instance))
+
+    @skippable
+    def related_model_post_delete_increment(self, sender, instance,
+                                            **kwargs):
+        try:
+            relation = getattr(instance, self.backwards_name)
+        except ObjectDoesNotExist:
+            # see `update_value_by` comments
+            return
+        if isinstance(relation, models.Manager):
+            return self.update_value_by(instance)
+        self.increment_value(relation, self.get_removal_increment(instance))
+
+    def increment_value(self, augmented_instance, increment):
+        if not isinstance(augmented_instance, self.model) or not increment:
+            return
+
+        if self.is_asynchronous:
+            # jobs recompute the value, increments aren't queued
+            return self.update_value(augmented_instance)
+        with self.increments_lock:
+            self.increments_count += 1
+            reconcile = (
+                self.reconcile_every and
+                not self.increments_count % self.reconcile_every)
+        if reconcile:
+            return self.update_value(augmented_instance)
+        if not state.defer_update(self, augmented_instance, increment):
+            write_values(augmented_instance, [(self, increment)])
 
 
 class AggregateField(DenormalizedFieldMixin):
-    # this class just overrides default value of constructor `default` kwarg
+    # whether value can be maintained with `F(field) + increment` updates
+    supports_increments = False
+
     def __init__(self, relation_name=None, internal_type=None, default=0,
+                 incremental=False, reconcile_every=1000, triggers=False,
                  **kwargs):
-        return super(AggregateField, self).__init__(
+        super(AggregateField, self).__init__(
             relation_name=relation_name, default=default, **kwargs)
+        if incremental and triggers:
+            raise ValueError(
+                'incremental updates are not available with triggers')
+        if incremental:
+            if not self.supports_increments:
+                raise ValueError(
+                    '%s does not support incremental updates'
+                    % type(self).__name__)
+            if self.filter:
+                raise ValueError(
+                    'incremental updates are not available with qs_filter')
+        self.incremental = incremental
+        # full recomputation is performed for every `reconcile_every`
+        # increment to fix possible drift (e.g. caused by ORM update
+        # statements)
+        self.reconcile_every = reconcile_every
+        self.increments_count = 0
+        self.triggers = triggers
+
+    @cached_property
+    def is_filter_aggregatable(self):
+        # lookups spanning multi-valued relations produce extra rows, which
+        # would affect other aggregates computed by the same query
+        return all(
+            is_single_valued_lookup(self.rel_model, lookup)
+            for lookup in iter_q_lookups(self.filter)
+        )
+
+    def get_aggregate_value(self, value):
+        return value if value is not None else self.default
+
+    def get_previous_increment(self, related_instance):
+        # a contribution of a single related instance as of its previous save
+        raise NotImplementedError('')
+
+    def get_removal_increment(self, related_instance, previous=False):
+        if previous:
+            return -self.get_previous_increment(related_instance)
+        return -self.get_increment(related_instance)
+
+    def get_change_increment(self, related_instance):
+        return (self.get_increment(related_instance) -
+                self.get_previous_increment(related_instance))
+
+    def get_incremented_value(self, augmented_instance, increment):
+        return Coalesce(
+            F(self.name), Value(0, output_field=self)
+        ) + Value(increment, output_field=self)
 
 
 class CountField(AggregateField, models.IntegerField):
 
+    supports_increments = True
+
+    def get_increment(self, related_instance):
+        return 1
+
+    def get_previous_increment(self, related_instance):
+        return 1
+
     def get_denormalized_value(self, instance=None, relation=None):
         return self.get_related_queryset(instance, relation).count()
 
-    @skippable
-    def related_model_post_save(self, sender, instance, created, raw=False,
-                                using=None, update_fields=None, **kwargs):
-        if created:
-            self.update_value_by(instance)
-        else:
-            current_val = getattr(instance, self.backwards_name)
-            prev_val = getattr(
-                instance, '_%s_prev' % self.backwards_name, None)
-            if prev_val != current_val or self.filter:
-                # there's a room for optimization here, we can check if
-                # `qs_filter` affected fields were actually changed
+    async def aget_denormalized_value(self, instance=None, relation=None):
+        if not this_django.async_orm:
+            return await super(CountField, self).aget_denormalized_value(
+                instance, relation)
+        return await self.get_related_queryset(instance, relation).acount()
 
-                #: relation changed case
-                if prev_val != current_val and prev_val:
-                    self.update_value(prev_val)
-                self.update_value_by(instance)
+    def get_aggregate(self, prefix=''):
+        if self.is_filter_aggregatable:
+            return Count(
+                prefix + 'pk', filter=prefix_q(self.filter, prefix) or None)
 
 
 class AnnotateField(AggregateField):
     def __init__(self, relation_name, field_name, **kwargs):
         super(AnnotateField, self).__init__(
             relation_name=relation_name, **kwargs)
+        if self.incremental and '__' in field_name:
+            raise ValueError(
+                'incremental updates are available for local fields only')
         self.field_name = field_name
 
+    def get_dependency_lookups(self):
+        lookups = super(AnnotateField, self).get_dependency_lookups()
+        return lookups + [self.field_name]
+
+    @cached_property
+    def is_aggregatable(self):
+        return self.is_filter_aggregatable and is_single_valued_lookup(
+            self.rel_model, self.field_name)
+
     def deconstruct(self):
         # django 1.7+
         name, path, args, kwargs = super(
@@ -304,15 +1082,38 @@ class AnnotateField(AggregateField):
             attr = getattr(self, attr_name)
             if attr:
                 kwargs[attr_name] = attr
+        if self.filter:
+            kwargs['qs_filter'] = self.filter
         return name, path, args, kwargs
 
-    @skippable
-    def related_model_post_save(self, sender, instance, created, raw=False,
-                                using=None, update_fields=None, **kwargs):
-        self.update_value_by(instance)
-
 
 class GenericSumField(AnnotateField):
+
+    supports_increments = True
+
+    def get_increment(self, related_instance):
+        return getattr(related_instance, self.field_name) or 0
+
+    def get_previous_increment(self, related_instance):
+        return self.get_previous_value(
+            related_instance, self.field_attname) or 0
+
+    def get_tracked_attnames(self):
+        attnames = super(GenericSumField, self).get_tracked_attnames()
+        if self.incremental:
+            attnames += (self.field_attname,)
+        return attnames
+
+    @cached_property
+    def field_attname(self):
+        return self.rel_model._meta.get_field(self.field_name).attname
+
+    def get_aggregate(self, prefix=''):
+        if self.is_aggregatable:
+            return Sum(
+                prefix + self.field_name,
+                filter=prefix_q(self.filter, prefix) or None)
+
     def get_denormalized_value(self, instance=None, relation=None):
         qs = self.get_related_queryset(instance, relation)
         result_key = '%s__sum' % self.field_name
@@ -320,6 +1121,15 @@ class GenericSumField(AnnotateField):
         value = result[result_key]
         return value if value is not None else self.default
 
+    async def aget_denormalized_value(self, instance=None, relation=None):
+        if not this_django.async_orm:
+            return await super(
+                GenericSumField, self).aget_denormalized_value(
+                    instance, relation)
+        qs = self.get_related_queryset(instance, relation)
+        result = await qs.aaggregate(abnorm=Sum(self.field_name))
+        return self.get_aggregate_value(result['abnorm'])
+
 
 class SumField(object):
     def __new__(cls, *args, **kwargs):
@@ -332,6 +1142,12 @@ class SumField(object):
 
 
 class GenericAvgField(AnnotateField):
+    def get_aggregate(self, prefix=''):
+        if self.is_aggregatable:
+            return Avg(
+                prefix + self.field_name,
+                filter=prefix_q(self.filter, prefix) or None)
+
     def get_denormalized_value(self, instance=None, relation=None):
         qs = self.get_related_queryset(instance, relation)
         result_key = '%s__avg' % self.field_name
@@ -339,6 +1155,15 @@ class GenericAvgField(AnnotateField):
         value = result[result_key]
         return value if value is not None else self.default
 
+    async def aget_denormalized_value(self, instance=None, relation=None):
+        if not this_django.async_orm:
+            return await super(
+                GenericAvgField, self).aget_denormalized_value(
+                    instance, relation)
+        qs = self.get_related_queryset(instance, relation)
+        result = await qs.aaggregate(abnorm=Avg(self.field_name))
+        return self.get_aggregate_value(result['abnorm'])
+
 
 class AvgField(object):
     def __new__(cls, *args, **kwargs):
@@ -350,12 +1175,18 @@ class AvgField(object):
         return field_class(*args, **kwargs)
 
 
-class RelationField(DenormalizedFieldMixin, models.TextField):
+class RelationFieldMixin(DenormalizedFieldMixin):
 
     generate_reverse_relation = False
 
+    # types of already serialized values
+    serialized_types = (str,)
+    empty_serialized_value = ''
+    default_serializer = None
+
     def __init__(self, relation_name=None, fields=None, limit=0,
-                 flat=False, **kwargs):
+                 flat=False, serializer=None, incremental=False,
+                 reconcile_every=1000, **kwargs):
         if not fields:
             raise ValueError('fields is a required parameter')
         for field in fields:
@@ -363,14 +1194,28 @@ class RelationField(DenormalizedFieldMixin, models.TextField):
         self.fields = fields
         self.limit = limit
         self.flat = flat
+        self.serializer_name = serializer
         kwargs['default'] = (
             kwargs.get('default') or (None if limit == 1 and flat else []))
-        super(RelationField, self).__init__(
+        super(RelationFieldMixin, self).__init__(
             relation_name=relation_name, **kwargs)
+        if incremental and self.filter:
+            raise ValueError(
+                'incremental updates are not available with qs_filter')
+        # items are added to / removed from the stored (top `limit`) ones on
+        # related model changes, a query is performed to refill it only
+        self.incremental = incremental
+        self.reconcile_every = reconcile_every
+        self.increments_count = 0
 
         this_django.apply_django_rel_hacks(self)
         self.to_fields = [None]
 
+    def contribute_to_class(self, cls, name, *args, **kwargs):
+        super(RelationFieldMixin, self).contribute_to_class(
+            cls, name, *args, **kwargs)
+        setattr(cls, self.attname, RelationFieldDescriptor(self))
+
     def deconstruct(self):
         # django 1.7+
         name, path, args, kwargs = super(
@@ -380,16 +1225,94 @@ class RelationField(DenormalizedFieldMixin, models.TextField):
             attr = getattr(self, attr_name)
             if attr:
                 kwargs[attr_name] = attr
+        if self.filter:
+            kwargs['qs_filter'] = self.filter
+        if self.serializer_name:
+            kwargs['serializer'] = self.serializer_name
         return name, path, args, kwargs
 
+    @cached_property
+    def serializer(self):
+        serializer = get_serializer(
+            self.serializer_name or self.default_serializer)
+        if serializer.binary and not self.is_binary:
+            raise ImproperlyConfigured(
+                '%s.%s: binary serializer requires BinaryRelationField' % (
+                    get_model_name(self.model), self.name))
+        return serializer
+
+    @property
+    def is_binary(self):
+        return bytes in self.serialized_types
+
+    def dumps(self, value):
+        return self.serializer.dumps(value)
+
+    def loads(self, data):
+        return self.serializer.loads(data)
+
     def extract_item_fields(self, item):
         result = {}
         for field_name in self.fields:
             result[field_name] = self.extract_item_field(item, field_name)
         return result
 
+    @cached_property
+    def forward_relation_attnames(self):
+        # {name: attname} of forward relations among `fields`
+        return {
+            name: field.attname for name, field in (
+                (name, get_local_field(self.rel_model, name))
+                for name in self.fields)
+            if field is not None and field.is_relation and
+            name == field.name
+        }
+
+    @cached_property
+    def item_columns(self):
+        """
+        Returns related model field names items are loaded with (see
+        `QuerySet.only`), None if `fields` are not all concrete ones
+        (e.g. properties may depend on any of them)
+        """
+        opts = self.rel_model._meta
+        columns = {opts.pk.name}
+        for name in self.fields:
+            field = get_local_field(self.rel_model, name)
+            if field is None:
+                return None
+            columns.add(field.name)
+        # related managers read the relation columns of loaded items
+        for attname in self.backwards_attnames:
+            field = get_local_field(self.rel_model, attname)
+            if field is not None:
+                columns.add(field.name)
+        return frozenset(columns)
+
+    def get_items_queryset(self, instance=None, relation=None, rows=False):
+        """
+        Returns related queryset loading just the columns required for
+        `fields`, as `values()` rows if `rows` is set
+        """
+        qs = self.get_related_queryset(instance, relation)
+        if rows:
+            return qs.values(*self.item_columns)
+        if self.item_columns is not None:
+            qs = qs.only(*self.item_columns)
+        return qs
+
     def extract_item_field(self, item, field_name):
-        field_value = getattr(item, field_name)
+        if field_name in self.forward_relation_attnames:
+            # related instance pk, which doesn't require a query
+            return getattr(item, self.forward_relation_attnames[field_name])
+        return self.get_item_field_value(
+            field_name, getattr(item, field_name), item.pk)
+
+    def get_item_field_value(self, field_name, field_value, pk):
+        # serializable `field_value` of the item with `pk`
+        if type(field_value) is LazyRelationValue:
+            # nested abnorm value loaded with `values()`
+            field_value = field_value.unwrap()
         if isinstance(field_value, FieldFile):
             field_value = field_value.name
         elif isinstance(field_value, (models.Model, list)) and field_value:
@@ -397,37 +1320,296 @@ class RelationField(DenormalizedFieldMixin, models.TextField):
                 self)._meta.get_field(field_name)
 
             if isinstance(remote_field, DenormalizedFieldMixin):
-                field_value = loads(remote_field.serialize_value(field_value))
+                # nested values are shared by fields over the same relation
+                field_value = state.get_cached(
+                    (remote_field, pk), {self.rel_model},
+                    lambda: remote_field.loads(
+                        remote_field.serialize_value(field_value)))
 
         return field_value
 
-    def get_denormalized_value(self, instance=None, relation=None):
-        qs = self.get_related_queryset(instance, relation)
+    @cached_property
+    def item_field_columns(self):
+        # {name in `fields`: related model field name}, see `item_columns`
+        return {
+            name: get_local_field(self.rel_model, name).name
+            for name in self.fields
+        }
+
+    def get_row_item(self, row):
+        # serializable item of a `values()` row
+        pk = row[self.rel_model._meta.pk.name]
+        return {
+            name: self.get_item_field_value(name, row[column], pk)
+            for name, column in self.item_field_columns.items()
+        }
+
+    @cached_property
+    def incremental_ordering(self):
+        """
+        Returns [(item key, related model field, descending)] items are
+        ordered by for incremental updates: related model ordering followed
+        by pk, all the fields are required to be among `fields`
+        """
+        opts = self.rel_model._meta
+        pk_key = 'pk' if 'pk' in self.fields else opts.pk.name
+        names = opts.ordering or ()
+        if not all(isinstance(name, str) for name in names) or '?' in names:
+            names = None
+        ordering = []
+        for name in names or ():
+            field = get_local_field(self.rel_model, name.lstrip('-'))
+            if field is not None and field.primary_key:
+                # pk is unique, the rest of the ordering never applies
+                ordering.append((pk_key, field, name.startswith('-')))
+                break
+            if (field is None or field.is_relation or field.null or
+                    field.name not in self.fields):
+                names = None
+                break
+            ordering.append((field.name, field, name.startswith('-')))
+        if names is None or pk_key not in self.fields:
+            raise ValueError(
+                '%s.%s: incremental updates require %s ordering by not '
+                'nullable local fields, which are listed in fields along '
+                'with pk' % (
+                    get_model_name(self.model), self.name,
+                    get_model_name(self.rel_model)))
+        if not ordering or not ordering[-1][1].primary_key:
+            ordering.append((pk_key, opts.pk, False))
+        return ordering
+
+    def get_item_key(self, item):
+        # sort key of serialized `item`
+        key = []
+        for name, field, descending in self.incremental_ordering:
+            value = field.to_python(item[name])
+            key.append(Descending(value) if descending else value)
+        return tuple(key)
+
+    def get_related_queryset(self, instance=None, relation=None):
+        qs = super(RelationFieldMixin, self).get_related_queryset(
+            instance, relation)
+        if self.incremental:
+            # full recomputation must agree with `get_incremented_value`
+            qs = qs.order_by(*[
+                ('-' if descending else '') + field.name
+                for name, field, descending in self.incremental_ordering])
+        return qs
+
+    def get_dependency_lookups(self):
+        # items fields and the ones they are ordered by
+        lookups = super(RelationFieldMixin, self).get_dependency_lookups()
+        for name in self.rel_model._meta.ordering or ():
+            if not isinstance(name, str):
+                # ordering by expressions
+                return None
+            lookups.append(name.lstrip('-'))
+        return lookups + list(self.fields)
+
+    @property
+    def items_priority(self):
+        # wider fields go first, so narrower ones reuse their items
+        return -self.limit if self.limit else -sys.maxsize
+
+    def get_related_items(self, instance, rows=False):
+        """
+        Returns related instances (or `values()` rows) shared by fields over
+        the same relation within `state.AbnormCache` block, None if they
+        can't be shared
+        """
+        if (not state.is_caching() or self.cache_models is None or
+                instance.pk is None):
+            return None
+        qs = self.get_related_queryset(instance)
+        if not qs.ordered:
+            # `first()` orders such querysets by pk, unlike slicing
+            return None
+        key = (self.rel_model, rows, str(qs.query))
+        columns = self.item_columns
+        entry = state.get_cache_value(key, self.cache_models)
+        if entry is not None:
+            limit, loaded_columns, items = entry
+            # items loaded w/o some of the columns would query them
+            if ((not limit or self.limit and limit >= self.limit) and
+                    (loaded_columns is None or
+                     columns is not None and columns <= loaded_columns)):
+                return items
+        if rows:
+            qs = qs.values(*columns)
+        elif columns is not None:
+            qs = qs.only(*columns)
+        items = list(qs[:self.limit] if self.limit else qs)
+        state.set_cache_value(
+            key, self.cache_models, (self.limit, columns, items))
+        return items
+
+    def get_items(self, instance=None, relation=None, rows=False):
+        # related instances (or `values()` rows) the value consists of
+        if relation is None:
+            items = self.get_related_items(instance, rows)
+            if items is not None:
+                return items[:self.limit] if self.limit else list(items)
+
+        qs = self.get_items_queryset(instance, relation, rows)
         if self.limit == 1 and self.flat:
-            return qs.first()
+            item = qs.first()
+            return [] if item is None else [item]
         elif self.limit:
             qs = qs[:self.limit]
         return list(qs)
 
+    def get_denormalized_value(self, instance=None, relation=None):
+        items = self.get_items(instance, relation)
+        if self.limit == 1 and self.flat:
+            return items[0] if items else None
+        return items
+
+    def get_computed_value(self, instance):
+        if self.item_columns is None:
+            return self.get_denormalized_value(instance)
+        # model instances are not required to serialize `values()` rows
+        items = [
+            self.get_row_item(row)
+            for row in self.get_items(instance, rows=True)]
+        if self.limit == 1 and self.flat:
+            if not items:
+                return None
+            items = items[0]
+        # deserialized on access, e.g. by augmented instance being saved
+        return LazyRelationValue(self, self.get_raw_value(items))
+
+    def get_raw_value(self, data):
+        # db value of serializable `data`, see `from_db_value`
+        return self.serialize_value(data)
+
+    async def aget_denormalized_value(self, instance=None, relation=None):
+        if not this_django.async_orm:
+            return await super(
+                RelationFieldMixin, self).aget_denormalized_value(
+                    instance, relation)
+        qs = self.get_items_queryset(instance, relation)
+        if self.limit == 1 and self.flat:
+            return await qs.afirst()
+        elif self.limit:
+            qs = qs[:self.limit]
+        return [item async for item in qs]
+
+    def setup_signals(self, cls):
+        if self.incremental:
+            # fail early on unsupported ordering
+            self.incremental_ordering
+        super(RelationFieldMixin, self).setup_signals(cls)
+
+    def get_increment(self, related_instance):
+        # [(pk, item or None if it's left the relation, whether the item
+        # keeps its place)], see `get_incremented_value`
+        return [(related_instance.pk,
+                 self.extract_item_fields(related_instance), False)]
+
+    def get_removal_increment(self, related_instance, previous=False):
+        return [(related_instance.pk, None, False)]
+
+    def get_change_increment(self, related_instance):
+        return [(related_instance.pk,
+                 self.extract_item_fields(related_instance),
+                 not self.is_reordered(related_instance))]
+
+    def is_reordered(self, instance):
+        # whether saved related `instance` may take another place among items
+        prev_values = instance._abnorm_prev
+        return any(
+            prev_values.get(field.attname) != getattr(instance, field.attname)
+            for name, field, descending in self.incremental_ordering[:-1])
+
+    def get_stored_items(self, augmented_instance):
+        # serialized items stored in the database, None if it's gone. The
+        # value is loaded into an instance, so it's not deserialized
+        stored = self.model._base_manager.filter(
+            pk=augmented_instance.pk).only(self.attname).first()
+        if stored is None:
+            return None
+        value = stored.__dict__[self.attname]
+        if type(value) is LazyRelationValue:
+            value = value.raw
+        if isinstance(value, self.serialized_types):
+            value = self.loads(value)
+        if value is None or isinstance(value, dict):
+            return [value] if value else []
+        return value
+
+    def get_patch_expression(self, augmented_instance, increment):
+        # expression replacing stored items in place, without reading them
+        return None
+
+    def get_incremented_value(self, augmented_instance, increment):
+        # `increment` is [(pk, item or None if it's left the relation,
+        # whether the item keeps its place)]
+        expression = self.get_patch_expression(augmented_instance, increment)
+        if expression is not None:
+            return expression
+
+        items = self.get_stored_items(augmented_instance)
+        if items is None:
+            return None
+        pk_key, pk_field = self.incremental_ordering[-1][:2]
+        for pk, item, in_place in increment:
+            is_full = bool(self.limit) and len(items) >= self.limit
+            threshold = self.get_item_key(items[-1]) if is_full else None
+            index = next((
+                i for i, stored in enumerate(items)
+                if pk_field.to_python(stored[pk_key]) == pk), None)
+            if in_place:
+                # items out of the window stay there
+                if index is not None:
+                    items[index] = item
+                continue
+            if index is not None:
+                del items[index]
+            if item is None:
+                if index is not None and is_full:
+                    # the window is to be refilled
+                    return None
+                continue
+            key = self.get_item_key(item)
+            if is_full and key > threshold:
+                if index is not None:
+                    # moved out of the window
+                    return None
+                continue
+            position = next((
+                i for i, stored in enumerate(items)
+                if self.get_item_key(stored) > key), len(items))
+            items.insert(position, item)
+            if self.limit:
+                del items[self.limit:]
+
+        if self.limit == 1 and self.flat:
+            return self.get_prep_value(items[0] if items else None)
+        return self.get_prep_value(items)
+
     def to_python(self, value):
         if state.SKIP_SIGNALS:
             return value
         return self.deserialize_value(value)
 
     def deserialize_value(self, value):
-        if value is None or value == '':
+        if value is None or value == self.empty_serialized_value:
             return None
 
-        descriptor = getattr(self.model, self.relation_name)
-        model = this_django.get_descriptor_rel_model(descriptor)
+        if type(value) is LazyRelationValue:
+            return value.unwrap()
 
-        if isinstance(value, str):
-            value = loads(value)
+        model = self.rel_model
+        plan = self.init_plan
+
+        if isinstance(value, self.serialized_types):
+            value = self.loads(value)
 
         if self.limit == 1 and self.flat:
             if not isinstance(value, dict):
                 value = self.extract_item_fields(value)
-            return init_model(model, value)
+            return init_model(model, value, plan)
 
         elif isinstance(value, list):
             not_list_of_dicts = any(
@@ -436,29 +1618,215 @@ class RelationField(DenormalizedFieldMixin, models.TextField):
             if not_list_of_dicts:
                 value = [self.extract_item_fields(v) for v in value]
 
-            return [init_model(model, v) for v in value]
+            return [init_model(model, v, plan) for v in value]
         return value
 
+    @cached_property
+    def init_plan(self):
+        # serialized items are keyed by `fields`
+        return get_init_plan(self.rel_model, set(self.fields))
+
     def get_prep_value(self, value):
         if state.SKIP_SIGNALS:
             return value
         return self.serialize_value(value)
 
+    def get_col(self, alias, output_field=None):
+        # a column per query, see `RelationCol`
+        return RelationCol(alias, self, output_field)
+
     def from_db_value(self, value, expression, connection):
         # a reverse of `get_prep_value` since django 1.8
+        if (getattr(expression, 'lazy', False) and value and
+                not state.SKIP_SIGNALS):
+            return LazyRelationValue(self, value)
         return self.to_python(value)
 
+    def pre_save(self, model_instance, add):
+        # values loaded from db are saved as is, w/o a round trip
+        value = model_instance.__dict__.get(self.attname)
+        if type(value) is LazyRelationValue:
+            return value.raw
+        return super(RelationFieldMixin, self).pre_save(model_instance, add)
+
     def serialize_value(self, value):
+        if type(value) is LazyRelationValue:
+            return value.raw
+
+        if value is None:
+            value = self.empty_serialized_value
+        elif not isinstance(value, self.serialized_types):
+            value = self.dumps(self.get_serializable_value(value))
+
+        return value
+
+    def get_serializable_value(self, value):
+        # a structure of serialized item fields
         if isinstance(value, models.query.QuerySet):
             value = list(value)
 
         if value is None:
-            value = ''
-        elif not isinstance(value, str):
-            if self.limit == 1 and self.flat:
-                value = self.extract_item_fields(value)
-            else:
-                value = [self.extract_item_fields(v) for v in value]
-            value = dumps(value)
+            return None
+        if self.limit == 1 and self.flat:
+            if isinstance(value, dict):
+                return value
+            return self.extract_item_fields(value)
+        return [
+            v if isinstance(v, dict) else self.extract_item_fields(v)
+            for v in value
+        ]
+
+
+class RelationField(RelationFieldMixin, models.TextField):
+    pass
+
+
+class BinaryRelationField(RelationField):
+    """
+    RelationField stored in a binary column, compact msgpack serializer is
+    used by default
+    """
+
+    serialized_types = (bytes,)
+    empty_serialized_value = b''
+    default_serializer = 'msgpack'
 
+    def get_internal_type(self):
+        return 'BinaryField'
+
+    def dumps(self, value):
+        value = self.serializer.dumps(value)
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        return value
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = super(BinaryRelationField, self).get_db_prep_value(
+            value, connection, prepared)
+        if value is not None:
+            return connection.Database.Binary(value)
         return value
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, memoryview):
+            value = bytes(value)
+        return super(BinaryRelationField, self).from_db_value(
+            value, expression, connection)
+
+
+class PatchJSONItems(Func):
+    """
+    Replaces items of json array `column` by their `key` values, with
+    `items` - {key value: json} - in place
+    """
+
+    vendors = ('postgresql', 'sqlite')
+    # a path to a missing array item, so unmatched items aren't replaced
+    missing_index = 2147483647
+
+    def __init__(self, column, key, items, **kwargs):
+        super(PatchJSONItems, self).__init__(F(column), **kwargs)
+        self.key = key
+        self.items = items
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotImplementedError(
+            'json items patching is not available for %s'
+            % connection.vendor)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        column, column_params = compiler.compile(self.source_expressions[0])
+        sql, params = column, list(column_params)
+        for value, item in self.items.items():
+            sql = (
+                'jsonb_set(%s, ARRAY[COALESCE(('
+                'SELECT (abnorm.i - 1)::text FROM jsonb_array_elements(%s) '
+                'WITH ORDINALITY AS abnorm(v, i) '
+                'WHERE abnorm.v -> %%s::text = %%s::jsonb'
+                "), '%d')], %%s::jsonb, false)" % (
+                    sql, column, self.missing_index))
+            params += list(column_params) + [self.key, value, item]
+        return sql, params
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        column, column_params = compiler.compile(self.source_expressions[0])
+        sql, params = column, list(column_params)
+        for value, item in self.items.items():
+            sql = (
+                "json_replace(%s, '$[' || COALESCE(("
+                'SELECT abnorm.key FROM json_each(%s) AS abnorm '
+                "WHERE json_extract(abnorm.value, '$.' || %%s) = "
+                "json_extract(%%s, '$')"
+                "), %d) || ']', json(%%s))" % (
+                    sql, column, self.missing_index))
+            params += list(column_params) + [self.key, value, item]
+        return sql, params
+
+
+if this_django.JSONField is not None:
+    class JSONRelationField(RelationFieldMixin, this_django.JSONField):
+        """
+        RelationField stored in a json column, so its contents can be queried
+        and indexed by the database, e.g.
+        `Post.objects.filter(first_comment__author_id=1)`
+        """
+
+        def __init__(self, *args, **kwargs):
+            kwargs.setdefault('encoder', DjangoJSONEncoder)
+            super(JSONRelationField, self).__init__(*args, **kwargs)
+            if self.default == []:
+                # see `CheckFieldDefaultMixin`
+                self.default = list
+
+        def deconstruct(self):
+            name, path, args, kwargs = super(
+                JSONRelationField, self).deconstruct()
+            if kwargs.get('encoder') is DjangoJSONEncoder:
+                del kwargs['encoder']
+            return name, path, args, kwargs
+
+        def get_prep_value(self, value):
+            if type(value) is LazyRelationValue:
+                value = value.raw
+            elif isinstance(value, self.serialized_types):
+                value = self.loads(value)
+            elif self.is_instances_value(value) and not state.SKIP_SIGNALS:
+                value = self.get_serializable_value(value)
+            # other values (e.g. lookup arguments) are json as is
+            return super(RelationFieldMixin, self).get_prep_value(value)
+
+        def get_raw_value(self, data):
+            return data
+
+        def get_patch_expression(self, augmented_instance, increment):
+            connection = connections[router.db_for_write(self.model)]
+            if (self.flat or connection.vendor not in PatchJSONItems.vendors
+                    or not all(in_place for _, _, in_place in increment)):
+                return None
+            pk_key = self.incremental_ordering[-1][0]
+            items = OrderedDict(
+                (json.dumps(pk, cls=self.encoder),
+                 json.dumps(item, cls=self.encoder))
+                for pk, item, in_place in increment)
+            return PatchJSONItems(
+                self.name, pk_key, items, output_field=self)
+
+        def is_instances_value(self, value):
+            if isinstance(value, (models.Model, models.query.QuerySet)):
+                return True
+            return isinstance(value, list) and any(
+                isinstance(v, models.Model) for v in value)
+
+        def from_db_value(self, value, expression, connection):
+            value = super(RelationFieldMixin, self).from_db_value(
+                value, expression, connection)
+            if this_django.is_json_key_transform(expression):
+                # e.g. `.values('first_comment__author_id')`
+                return value
+            return super(JSONRelationField, self).from_db_value(
+                value, expression, connection)
+else:
+    class JSONRelationField(object):
+        def __new__(cls, *args, **kwargs):
+            raise ImproperlyConfigured(
+                'JSONRelationField requires django 3.1+')
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from abnorm.tasks import DatabaseBackend
+
+
+class Command(BaseCommand):
+    help = '''
+    Performs abnorm fields recomputation jobs queued with database backend
+    (`ABNORM_ASYNC_BACKEND = 'database'`)
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of jobs performed within a single transaction')
+        parser.add_argument(
+            '--sleep', type=float, default=1.0,
+            help='Seconds to wait for new jobs once the queue is drained')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once the queue is drained')
+
+    def handle(self, *args, **options):
+        backend = DatabaseBackend()
+        batch_size = options.get('batch_size') or 100
+        while True:
+            if backend.process(batch_size):
+                continue
+            if options.get('once'):
+                return
+            time.sleep(options.get('sleep') or 0)
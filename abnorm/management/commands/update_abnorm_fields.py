@@ -1,36 +1,150 @@
-import gc
+import json
+import multiprocessing
+import os
 
-from django.core.management.base import BaseCommand
-from django.db import transaction
-from django.utils.decorators import method_decorator
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+from django.db.models import Max
 
+from abnorm import state
 from abnorm.adapters import this_django
+from abnorm.bulk import is_bulk_updatable, update_aggregate_values
 
 try:
     from progress.bar import Bar
 except ImportError:
     Bar = None
 
+# instances are saved while iterating, so with other backends every chunk
+# is fetched completely before processing
+SERVER_SIDE_CURSOR_VENDORS = ('postgresql', 'oracle')
 
-def queryset_iterator(queryset, chunksize=1000):
-    last_item = queryset.order_by('-pk').first()
-    if not last_item:
-        return
 
-    pk = 0
+def queryset_iterator(queryset, chunksize=1000):
+    # keyset pagination, so there's no need to know the table size upfront
     queryset = queryset.order_by('pk')
-    while pk < last_item.pk:
-        for row in queryset.filter(pk__gt=pk)[:chunksize]:
+    stream = connections[queryset.db].vendor in SERVER_SIDE_CURSOR_VENDORS
+    pk = None
+    while True:
+        page = queryset if pk is None else queryset.filter(pk__gt=pk)
+        page = page[:chunksize]
+        rows = page.iterator(chunk_size=chunksize) if stream else list(page)
+        count = 0
+        for row in rows:
+            count += 1
             pk = row.pk
             yield row
-        gc.collect()
-
-
-def with_progress_bar(queryset, message='', total=None):
-    progress_bar = Bar(message, max=total or queryset.count())
-    for instance in progress_bar.iter(queryset):
-        yield instance
-    progress_bar.finish()
+        if count < chunksize:
+            return
+
+
+def pk_chunks_iterator(queryset, chunksize=1000):
+    pk = None
+    queryset = queryset.order_by('pk').values_list('pk', flat=True)
+    while True:
+        chunk_queryset = queryset if pk is None else queryset.filter(pk__gt=pk)
+        pks = list(chunk_queryset[:chunksize])
+        if not pks:
+            return
+        pk = pks[-1]
+        yield pks
+
+
+def get_pk_ranges(queryset, size):
+    """
+    Returns [start, stop) pk ranges of `size` instances each, bounds are
+    taken from existing pks (keyset pagination), so sparse tables don't
+    produce empty ranges. Ranges are the same for every run, unless rows
+    are added or removed in between
+    """
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    max_pk = queryset.aggregate(max_pk=Max('pk'))['max_pk']
+    ranges = []
+    start = pks.first()
+    while start is not None:
+        # the first pk of the next range
+        stop = next(iter(pks.filter(pk__gte=start)[size:size + 1]), None)
+        ranges.append((start, max_pk + 1 if stop is None else stop))
+        start = stop
+    return ranges
+
+
+def has_integer_pk(model):
+    return model._meta.pk.get_internal_type() in (
+        'AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField',
+        'BigIntegerField', 'SmallIntegerField', 'PositiveIntegerField',
+        'PositiveBigIntegerField', 'PositiveSmallIntegerField',
+    )
+
+
+def get_only_fields(model, field_names):
+    # tracked fields are loaded as well, otherwise abnorm would have to fetch
+    # their original values on save
+    attnames = state.tracked_attnames.get(model, ())
+    names = {
+        f.name for f in model._meta.concrete_fields if f.attname in attnames}
+    return sorted(names | {model._meta.pk.name} | set(field_names))
+
+
+def migrate_chunk(model, fields, queryset, chunksize=1000):
+    # every chunk is processed within its own transaction
+    with transaction.atomic(using=router.db_for_write(model)):
+        # aggregates are computed in bulk, other fields are updated one
+        # instance at a time
+        bulk_fields = [f for f in fields if is_bulk_updatable(f)]
+        if bulk_fields:
+            pks = list(queryset.values_list('pk', flat=True))
+            if pks:
+                update_aggregate_values(model, bulk_fields, pks)
+
+        field_names = [f.name for f in fields if f not in bulk_fields]
+        if field_names:
+            queryset = queryset.only(*get_only_fields(model, field_names))
+            for instance in queryset_iterator(queryset, chunksize):
+                instance.save(update_fields=field_names)
+
+
+def migrate_range(task):
+    # runs within worker processes, so takes picklable args only
+    model_name, field_names, start, stop, chunksize = task
+    model = this_django.get_model(model_name)
+    fields = [model._meta.get_field(name) for name in field_names]
+    migrate_chunk(
+        model, fields,
+        model._base_manager.filter(pk__gte=start, pk__lt=stop), chunksize)
+    return task[:4]
+
+
+class Checkpoint(object):
+    """
+    Keeps track of completed pk ranges (one json object per line)
+    """
+
+    def __init__(self, path, resume=False):
+        self.completed = set()
+        if resume and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        self.completed.add(self.get_key(**json.loads(line)))
+        self.file = open(path, 'a' if resume else 'w')
+
+    def get_key(self, model, fields, start, stop):
+        return (model, tuple(sorted(fields)), start, stop)
+
+    def is_completed(self, model, fields, start, stop):
+        return self.get_key(model, fields, start, stop) in self.completed
+
+    def add(self, model, fields, start, stop):
+        self.completed.add(self.get_key(model, fields, start, stop))
+        self.file.write(json.dumps({
+            'model': model, 'fields': sorted(fields),
+            'start': start, 'stop': stop,
+        }) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
 
 
 class Command(BaseCommand):
@@ -40,8 +154,19 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('field', nargs='+')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Size of pk range processed within a single transaction')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Number of worker processes')
+        parser.add_argument(
+            '--checkpoint',
+            help='File to keep track of completed pk ranges in')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Skip pk ranges completed according to --checkpoint file')
 
-    @method_decorator(transaction.atomic)
     def handle(self, *args, **options):
         fields = options.get('field', [])
         groups = {}
@@ -49,17 +174,70 @@ class Command(BaseCommand):
             model_name, field_name = f.rsplit('.', 1)
             groups.setdefault(model_name, []).append(field_name)
 
-        for model_name, field_names in groups.items():
-            self.migrate_fields(model_name, field_names)
+        if options.get('resume') and not options.get('checkpoint'):
+            raise CommandError('--resume requires --checkpoint')
+
+        self.chunk_size = options.get('chunk_size') or 1000
+        self.workers = options.get('workers') or 1
+        self.checkpoint = None
+        if options.get('checkpoint'):
+            self.checkpoint = Checkpoint(
+                options['checkpoint'], resume=options.get('resume'))
+
+        try:
+            for model_name, field_names in groups.items():
+                self.migrate_fields(model_name, field_names)
+        finally:
+            if self.checkpoint is not None:
+                self.checkpoint.close()
 
     def migrate_fields(self, model_name, field_names):
         model = this_django.get_model(model_name)
         queryset = model._base_manager.all()
-        instances = queryset_iterator(queryset)
 
+        if not has_integer_pk(model):
+            if self.workers > 1 or self.checkpoint is not None:
+                raise CommandError(
+                    '%s has non-integer primary key, --workers and '
+                    '--checkpoint are not supported' % model_name)
+            fields = [model._meta.get_field(name) for name in field_names]
+            for pks in pk_chunks_iterator(queryset, self.chunk_size):
+                migrate_chunk(
+                    model, fields, queryset.filter(pk__in=pks),
+                    self.chunk_size)
+            return
+
+        tasks = [
+            (model_name, field_names, start, stop, self.chunk_size)
+            for start, stop in get_pk_ranges(queryset, self.chunk_size)
+            if self.checkpoint is None or
+            not self.checkpoint.is_completed(
+                model_name, field_names, start, stop)
+        ]
+
+        progress_bar = None
         if Bar is not None:
-            instances = with_progress_bar(
-                instances, message=model_name, total=queryset.count())
-
-        for instance in instances:
-            instance.save(update_fields=field_names)
+            progress_bar = Bar(model_name, max=len(tasks))
+
+        if self.workers > 1:
+            # every worker process has to establish its own db connection
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(self.workers)
+            try:
+                completed = pool.imap_unordered(migrate_range, tasks)
+                self.track_completed(completed, progress_bar)
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            self.track_completed(map(migrate_range, tasks), progress_bar)
+
+        if progress_bar is not None:
+            progress_bar.finish()
+
+    def track_completed(self, completed, progress_bar):
+        for model_name, field_names, start, stop in completed:
+            if self.checkpoint is not None:
+                self.checkpoint.add(model_name, field_names, start, stop)
+            if progress_bar is not None:
+                progress_bar.next()
@@ -0,0 +1,163 @@
+"""
+Managers keeping abnorm fields up to date on bulk operations, which bypass
+model signals
+"""
+from django.db import models, transaction
+
+from .adapters import this_django
+from .bulk import update_values
+from .dispatch import get_dependent_fields
+from .utils import chunks
+from . import state
+
+
+class AbnormQuerySet(models.QuerySet):
+
+    def get_affected_pks(self, relations, pks, result=None):
+        """
+        Returns {(augmented model, relation name): set of pks} of augmented
+        instances related to instances with `pks`
+        """
+        result = {} if result is None else result
+        for model, relation_name in relations:
+            descriptor = getattr(model, relation_name)
+            lookup = this_django.get_descriptor_query_name(descriptor) + '__in'
+            affected = result.setdefault((model, relation_name), set())
+            for chunk in chunks(pks):
+                affected.update(model._base_manager.filter(**{
+                    lookup: chunk
+                }).values_list('pk', flat=True))
+        return result
+
+    def get_updated_relations(self, relations, names):
+        """
+        Returns `relations` limited to the fields depending on the model
+        fields with `names`
+        """
+        result = {}
+        for key, fields in relations.items():
+            fields = [
+                field for field in fields
+                if field.dependency_fields is None or any(
+                    f.name in names or f.attname in names
+                    for f in field.dependency_fields)
+            ]
+            if fields:
+                result[key] = fields
+        return result
+
+    def update_abnorm_values(self, relations, affected):
+        state.invalidate_cache(self.model)
+        for (model, relation_name), pks in affected.items():
+            if not pks:
+                continue
+            fields = []
+            for field in relations[(model, relation_name)]:
+                if field.is_asynchronous:
+                    field.update_values(pks)
+                else:
+                    fields.append(field)
+            if not fields:
+                continue
+            # deferred updates queue is joined, so increments pending for
+            # the same instances aren't applied on top of recomputed values
+            if state.get_queue(model) is None:
+                update_values(model, fields, pks)
+            else:
+                for field in fields:
+                    state.defer_bulk_update(field, pks)
+
+    def update(self, **kwargs):
+        relations = self.get_updated_relations(
+            get_dependent_fields(self.model), kwargs)
+        if not relations or state.SKIP_SIGNALS:
+            return super(AbnormQuerySet, self).update(**kwargs)
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            pks = list(self.values_list('pk', flat=True))
+            # both previous and new related instances are affected
+            affected = self.get_affected_pks(relations, pks)
+            rows = super(AbnormQuerySet, self).update(**kwargs)
+            self.get_affected_pks(relations, pks, affected)
+            self.update_abnorm_values(relations, affected)
+        return rows
+    update.alters_data = True
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        fields = list(fields)
+        relations = self.get_updated_relations(
+            get_dependent_fields(self.model), fields)
+        if not relations or state.SKIP_SIGNALS:
+            return super(AbnormQuerySet, self).bulk_update(
+                objs, fields, *args, **kwargs)
+
+        objs = list(objs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            pks = [obj.pk for obj in objs]
+            affected = self.get_affected_pks(relations, pks)
+            rows = super(AbnormQuerySet, self).bulk_update(
+                objs, fields, *args, **kwargs)
+            self.get_affected_pks(relations, pks, affected)
+            self.update_abnorm_values(relations, affected)
+        return rows
+    bulk_update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        relations = get_dependent_fields(self.model)
+        if not relations or state.SKIP_SIGNALS:
+            return super(AbnormQuerySet, self).bulk_create(
+                objs, *args, **kwargs)
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super(AbnormQuerySet, self).bulk_create(
+                objs, *args, **kwargs)
+            pks = [obj.pk for obj in objs if obj.pk is not None]
+            if len(pks) < len(objs):
+                # primary keys aren't returned by some backends
+                affected = self.get_created_affected_pks(relations, objs)
+            else:
+                affected = self.get_affected_pks(relations, pks)
+            self.update_abnorm_values(relations, affected)
+        return objs
+    bulk_create.alters_data = True
+
+    def get_created_affected_pks(self, relations, objs):
+        # new instances have no many-to-many relations yet, so their
+        # foreign keys values are the only ones to look at
+        result = {}
+        for model, relation_name in relations:
+            field = relations[(model, relation_name)][0]
+            attnames = field.backwards_attnames
+            affected = result.setdefault((model, relation_name), set())
+            if len(attnames) == 1:
+                fk = field.rel_model._meta.get_field(field.backwards_name)
+                values = set(getattr(obj, attnames[0]) for obj in objs)
+                lookup = fk.target_field.attname + '__in'
+            elif len(attnames) == 2:
+                # generic relation
+                from django.contrib.contenttypes.models import ContentType
+                ct_id = ContentType.objects.get_for_model(model).pk
+                values = set(
+                    getattr(obj, attnames[1]) for obj in objs
+                    if getattr(obj, attnames[0]) == ct_id)
+                lookup = 'pk__in'
+            else:
+                continue
+            values.discard(None)
+            for chunk in chunks(values):
+                affected.update(model._base_manager.filter(**{
+                    lookup: chunk
+                }).values_list('pk', flat=True))
+        return result
+
+    def delete(self):
+        # abnorm handles deleted instances signals, those updates are
+        # coalesced to recompute every affected instance just once
+        with state.AbnormDeferrer():
+            return super(AbnormQuerySet, self).delete()
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class AbnormManager(models.Manager.from_queryset(AbnormQuerySet)):
+    pass
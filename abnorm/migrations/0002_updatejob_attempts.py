@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('abnorm', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='updatejob',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='updatejob',
+            name='error',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
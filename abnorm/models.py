@@ -0,0 +1,24 @@
+from django.db import models
+
+
+class UpdateJob(models.Model):
+    """
+    Pending abnorm fields recomputation of a single instance, see
+    `tasks.DatabaseBackend`
+    """
+    # explicit, so DEFAULT_AUTO_FIELD setting doesn't affect migrations
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=255)
+    object_pk = models.CharField(max_length=255)
+    # comma separated field names
+    fields = models.TextField()
+    created = models.DateTimeField(auto_now_add=True)
+    # failed attempts, the job is dropped after `ABNORM_ASYNC_MAX_ATTEMPTS`
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+
+    class Meta:
+        unique_together = ('model', 'object_pk')
+
+    def __str__(self):
+        return '%s #%s: %s' % (self.model, self.object_pk, self.fields)
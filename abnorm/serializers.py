@@ -0,0 +1,87 @@
+import datetime
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+from .utils import dumps, loads
+
+
+SERIALIZERS = {
+    'json': 'abnorm.serializers.JSONSerializer',
+    'orjson': 'abnorm.serializers.OrjsonSerializer',
+    'msgpack': 'abnorm.serializers.MsgpackSerializer',
+}
+
+_serializers = {}
+
+json_encode_default = DjangoJSONEncoder().default
+
+
+def encode_default(value):
+    # json compatible representation of Decimal, datetime, UUID etc, values
+    # are restored by related model fields `to_python`. Unlike
+    # DjangoJSONEncoder one, datetime and time keep microseconds
+    if isinstance(value, (datetime.datetime, datetime.time)):
+        return value.isoformat()
+    return json_encode_default(value)
+
+
+def get_serializer(name=None):
+    """
+    Returns serializer by name (see `SERIALIZERS`) or dotted path,
+    `ABNORM_SERIALIZER` setting is used by default
+    """
+    if name is None:
+        name = getattr(settings, 'ABNORM_SERIALIZER', 'json')
+    if name not in _serializers:
+        try:
+            serializer = import_string(SERIALIZERS.get(name, name))()
+        except ImportError as e:
+            raise ImproperlyConfigured(
+                'Unable to load abnorm serializer %r: %s' % (name, e))
+        _serializers[name] = serializer
+    return _serializers[name]
+
+
+class JSONSerializer(object):
+    # whether `dumps` output requires a binary column
+    binary = False
+
+    def dumps(self, value):
+        return dumps(value)
+
+    def loads(self, data):
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return loads(data)
+
+
+class OrjsonSerializer(object):
+    binary = False
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+
+    def dumps(self, value):
+        return self.orjson.dumps(value, default=encode_default).decode('utf-8')
+
+    def loads(self, data):
+        return self.orjson.loads(data)
+
+
+class MsgpackSerializer(object):
+    binary = True
+
+    def __init__(self):
+        import msgpack
+        self.msgpack = msgpack
+
+    def dumps(self, value):
+        return self.msgpack.packb(
+            value, default=encode_default, use_bin_type=True)
+
+    def loads(self, data):
+        return self.msgpack.unpackb(data, raw=False)
@@ -1,10 +1,43 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.conf import settings
+from django.db import router, transaction
+
 from .adapters import this_django
+from .utils import get_model_name
 
 delayed_setup_signals = []
 signals_connected = []
+# related model -> set of field attnames to keep original values of
+tracked_attnames = {}
+# (augmented model name, relation name) -> `dispatch.RelationDispatcher`
+dispatchers = {}
+# (signal, sender) -> tuple of handlers (see `dispatch.connect`)
+dispatch_table = {}
+# model -> set of models abnorm fields of which depend on its abnorm fields
+# (see `post_update`)
+cascade_graph = {}
+# model -> position in the cascade (see `get_cascade_rank`)
+cascade_ranks = None
 
 SKIP_SIGNALS = this_django.is_migration_command_running()
 
+_local = threading.local()
+# context variable rather than thread local, so the queue is shared by async
+# code and the sync one it runs with `sync_to_async`
+_deferred_updates = ContextVar('abnorm_deferred_updates', default=None)
+_cache = ContextVar('abnorm_cache', default=None)
+
+logger = logging.getLogger('abnorm')
+
 
 class AbnormBlocker(object):
     def __init__(self):
@@ -17,3 +50,488 @@ class AbnormBlocker(object):
     def __exit__(self, *args, **kwargs):
         global SKIP_SIGNALS
         SKIP_SIGNALS = self.SKIP_SIGNALS
+
+
+class AbnormCache(object):
+    """
+    Shares denormalized values and related items computed within the block
+    (e.g. by different fields over the same relation, or along a cascade),
+    until the models they depend on are written (see `invalidate_cache`).
+    Nested blocks share the outermost cache. Deferred updates and signals
+    are handled within one, user code is not, as writes bypassing abnorm
+    don't invalidate it.
+    """
+    def __init__(self):
+        self.values = {}
+        self.versions = {}
+
+    def __enter__(self):
+        self.outer_cache = _cache.get()
+        if self.outer_cache is None:
+            _cache.set(self)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.outer_cache is None:
+            _cache.set(None)
+
+    def get_version(self, models):
+        return frozenset(
+            (model, self.versions.get(model, 0)) for model in models)
+
+
+def is_caching():
+    return _cache.get() is not None
+
+
+def get_cache_value(key, models):
+    # value cached by `key`, unless `models` have been written since
+    cache = _cache.get()
+    if cache is None:
+        return None
+    entry = cache.values.get(key)
+    if entry is not None and entry[0] == cache.get_version(models):
+        return entry[1]
+    return None
+
+
+def set_cache_value(key, models, value):
+    cache = _cache.get()
+    if cache is not None:
+        cache.values[key] = (cache.get_version(models), value)
+
+
+def get_cached(key, models, compute):
+    """
+    Returns `compute()` result, which depends on `models` data, cached by
+    `key` if the cache is active
+    """
+    if not is_caching():
+        return compute()
+    cache = _cache.get()
+    entry = cache.values.get(key)
+    version = cache.get_version(models)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    value = compute()
+    cache.values[key] = (version, value)
+    return value
+
+
+def invalidate_cache(model):
+    # called on `model` data writes
+    cache = _cache.get()
+    if cache is not None:
+        cache.versions[model] = cache.versions.get(model, 0) + 1
+
+
+class AbnormDeferrer(object):
+    """
+    Collects abnorm fields updates triggered within the block and performs
+    each distinct (model, pk, field) update just once on exit.
+    Nested blocks are merged into the outermost one.
+    Works as async context manager as well, updates are performed with
+    async ORM then (see `aperform_deferred_updates`).
+    """
+    def __enter__(self):
+        self.outer_queue = _deferred_updates.get()
+        if self.outer_queue is None:
+            _deferred_updates.set(UpdateQueue())
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.outer_queue is not None:
+            return
+        queue = _deferred_updates.get()
+        try:
+            if exc_type is None:
+                perform_deferred_updates(queue)
+        finally:
+            _deferred_updates.set(None)
+
+    async def __aenter__(self):
+        self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if self.outer_queue is not None:
+            return
+        queue = _deferred_updates.get()
+        try:
+            if exc_type is None:
+                await aperform_deferred_updates(queue)
+        finally:
+            _deferred_updates.set(None)
+
+
+def is_deferring(model):
+    if _deferred_updates.get() is not None:
+        return True
+    if not getattr(settings, 'ABNORM_DEFER_UNTIL_COMMIT', False):
+        return False
+    using = router.db_for_write(model)
+    return transaction.get_connection(using).in_atomic_block
+
+
+@contextmanager
+def coalesce_updates(model):
+    """
+    Makes updates triggered by `model` changes within the block to be
+    written with a single UPDATE per augmented instance, unless they are
+    deferred already
+    """
+    if is_deferring(model):
+        yield
+    else:
+        with AbnormDeferrer():
+            yield
+
+
+def add_cascade_dependency(sender, model):
+    global cascade_ranks
+    cascade_graph.setdefault(sender, set()).add(model)
+    cascade_ranks = None
+
+
+def get_strongly_connected_components(graph):
+    # Tarjan's algorithm, components come in reverse topological order
+    index, lowlink, stack, on_stack = {}, {}, [], set()
+    components = []
+
+    def visit(node):
+        index[node] = lowlink[node] = len(index)
+        stack.append(node)
+        on_stack.add(node)
+        for successor in graph.get(node, ()):
+            if successor not in index:
+                visit(successor)
+                lowlink[node] = min(lowlink[node], lowlink[successor])
+            elif successor in on_stack:
+                lowlink[node] = min(lowlink[node], index[successor])
+        if lowlink[node] == index[node]:
+            component = set()
+            while True:
+                member = stack.pop()
+                on_stack.discard(member)
+                component.add(member)
+                if member is node:
+                    break
+            components.append(component)
+
+    for node in list(graph):
+        if node not in index:
+            visit(node)
+    return components
+
+
+def get_cascade_rank(model):
+    """
+    Returns the length of the longest `post_update` cascade path leading to
+    `model`, so updates of lower ranked models are written first and every
+    instance is updated once all its sources are. Models of a cycle (e.g.
+    self-referential relations) share the same rank.
+    """
+    global cascade_ranks
+    if cascade_ranks is None:
+        ranks = {}
+        for component in reversed(
+                get_strongly_connected_components(cascade_graph)):
+            rank = max(ranks.get(node, 0) for node in component)
+            for node in component:
+                ranks[node] = rank
+            for node in component:
+                for successor in cascade_graph.get(node, ()):
+                    if successor not in component:
+                        ranks[successor] = max(
+                            ranks.get(successor, 0), rank + 1)
+        cascade_ranks = ranks
+    return cascade_ranks.get(model, 0)
+
+
+class InstanceUpdate(object):
+    """
+    Deferred {field name: (field, increment)} updates of a single instance
+    """
+
+    def __init__(self, instance, origin):
+        self.instance = instance
+        self.updates = OrderedDict()
+        self.origin = origin
+
+    def add(self, field, increment=None):
+        if field.name in self.updates:
+            prev_increment = self.updates[field.name][1]
+            if prev_increment is None or increment is None:
+                increment = None
+            else:
+                increment = prev_increment + increment
+        self.updates[field.name] = (field, increment)
+
+    def recompute(self, field):
+        # makes pending increment of `field` a full recomputation
+        if field.name in self.updates:
+            self.updates[field.name] = (field, None)
+
+    def get_keys(self):
+        return {(get_model_name(type(self.instance)), self.instance.pk)}
+
+    def defer(self):
+        for field, increment in self.updates.values():
+            defer_update(field, self.instance, increment)
+
+    def write(self):
+        from .fields import write_values
+        write_values(self.instance, self.updates.values())
+
+    async def awrite(self):
+        from .fields import awrite_values
+        await awrite_values(self.instance, self.updates.values())
+
+    def notify(self):
+        from .fields import post_update
+        post_update.send(sender=type(self.instance), instance=self.instance)
+
+
+class BulkUpdate(object):
+    """
+    Deferred recomputation of fields for many instances of the same model,
+    performed in a set-based way (see `bulk.update_values`)
+    """
+
+    def __init__(self, model, origin):
+        self.model = model
+        self.fields = OrderedDict()
+        self.pks = set()
+        self.origin = origin
+
+    def add(self, field, pks):
+        self.fields[field.name] = field
+        self.pks.update(pks)
+
+    def get_keys(self):
+        model_name = get_model_name(self.model)
+        return {(model_name, pk) for pk in self.pks}
+
+    def defer(self):
+        for field in self.fields.values():
+            defer_bulk_update(field, self.pks)
+
+    def write(self):
+        from .bulk import update_values
+        update_values(self.model, list(self.fields.values()), self.pks)
+
+    async def awrite(self):
+        # performed synchronously (see `notify`)
+        pass
+
+    def notify(self):
+        self.write()
+
+
+class UpdateQueue(object):
+    """
+    Deferred updates, every (model, pk) gets a single entry, instances
+    recomputed in bulk get a single entry per model.
+    Entries are written in the cascade order (see `get_cascade_rank`), so
+    cascades are breadth-first and every instance of acyclic models
+    dependencies is updated at most once. Entries leading back to an
+    instance they originate from (data cycles) are dropped, so are the ones
+    `ABNORM_MAX_CASCADE_DEPTH` steps away from the original change, if
+    it's set.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.heap = []
+        self.counter = itertools.count()
+        # (model name, pk) keys of the entries chain being written
+        self.path = frozenset()
+        self.depth = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def values(self):
+        return list(self.entries.values())
+
+    def is_too_deep(self, model_name, field):
+        max_depth = getattr(settings, 'ABNORM_MAX_CASCADE_DEPTH', None)
+        if max_depth is not None and self.depth > max_depth:
+            logger.warning(
+                'abnorm cascade depth limit (%s) exceeded: %s.%s is not '
+                'updated', max_depth, model_name, field.name)
+            return True
+        return False
+
+    def get_entry(self, key, model, entry_class, target):
+        if key not in self.entries:
+            # (path, depth) of the entry it's caused by
+            self.entries[key] = entry_class(target, (self.path, self.depth))
+            heapq.heappush(self.heap, (
+                get_cascade_rank(model), next(self.counter), key))
+        return self.entries[key]
+
+    def add(self, field, instance, increment=None):
+        model = type(instance)
+        key = (get_model_name(model), instance.pk)
+        if key in self.path:
+            logger.warning(
+                'abnorm cascade cycle: %s.%s of #%s depends on itself',
+                key[0], field.name, key[1])
+            return
+        if self.is_too_deep(key[0], field):
+            return
+        bulk_entry = self.entries.get((key[0], None))
+        if (increment is not None and bulk_entry is not None and
+                field.name in bulk_entry.fields and
+                instance.pk in bulk_entry.pks):
+            # the change is accounted by bulk recomputation already, so
+            # it's not applied on top of it
+            increment = None
+        entry = self.get_entry(key, model, InstanceUpdate, instance)
+        entry.add(field, increment)
+
+    def add_bulk(self, field, pks):
+        model = field.model
+        model_name = get_model_name(model)
+        cycled = {pk for pk in pks if (model_name, pk) in self.path}
+        if cycled:
+            logger.warning(
+                'abnorm cascade cycle: %s.%s of %s depend on themselves',
+                model_name, field.name,
+                ', '.join('#%s' % pk for pk in sorted(cycled)))
+        pks = set(pks) - cycled
+        if not pks or self.is_too_deep(model_name, field):
+            return
+        # pending increments would be applied on top of recomputed values
+        for pk in pks:
+            entry = self.entries.get((model_name, pk))
+            if entry is not None:
+                entry.recompute(field)
+        # pk is never None for saved instances
+        entry = self.get_entry((model_name, None), model, BulkUpdate, model)
+        entry.add(field, pks)
+
+    def extend(self, queue):
+        for entry in queue.values():
+            entry.defer()
+
+    def pop(self):
+        """
+        Returns the next entry to write, updates added until the next call
+        are considered caused by it
+        """
+        _, _, key = heapq.heappop(self.heap)
+        entry = self.entries.pop(key)
+        self.activate(entry)
+        return entry
+
+    def pop_rank(self):
+        """
+        Returns all the entries of the next rank, they don't depend on
+        each other
+        """
+        rank = self.heap[0][0]
+        entries = []
+        while self.heap and self.heap[0][0] == rank:
+            _, _, key = heapq.heappop(self.heap)
+            entries.append(self.entries.pop(key))
+        return entries
+
+    def activate(self, entry):
+        # makes updates added from now on caused by `entry`
+        path, depth = entry.origin
+        self.path = path | entry.get_keys()
+        self.depth = depth + 1
+
+    def notify(self, entries):
+        # informs related models about written `entries`
+        for entry in entries:
+            self.activate(entry)
+            entry.notify()
+
+
+def get_commit_queue(model):
+    """
+    Returns the queue of updates deferred until the current transaction (or
+    savepoint) of `model` database is committed. It's performed by a single
+    `on_commit` callback, so the queue is dropped along with the callback
+    on rollback.
+    """
+    using = router.db_for_write(model)
+    connection = transaction.get_connection(using)
+    queues = getattr(_local, 'commit_queues', None)
+    if queues is None:
+        queues = _local.commit_queues = {}
+    callbacks = [entry[1] for entry in connection.run_on_commit]
+    key = (using, tuple(connection.savepoint_ids))
+    if key in queues and queues[key][1] in callbacks:
+        return queues[key][0]
+
+    # queues of rolled back transactions are never performed
+    for other_key, (queue, callback) in list(queues.items()):
+        if other_key[0] == using and callback not in callbacks:
+            del queues[other_key]
+    queue = UpdateQueue()
+    callback = partial(perform_commit_updates, key)
+    queues[key] = (queue, callback)
+    transaction.on_commit(callback, using=using)
+    return queue
+
+
+def get_queue(model):
+    # returns the queue to put `model` instances updates into, if any
+    queue = _deferred_updates.get()
+    if queue is None and is_deferring(model):
+        queue = get_commit_queue(model)
+    return queue
+
+
+def defer_update(field, instance, increment=None):
+    """
+    Puts `field` update for `instance` into the deferred updates queue.
+    `increment` is used for incremental updates, full recomputation is
+    performed otherwise.
+    Returns False if updates are not deferred at the moment.
+    """
+    queue = get_queue(type(instance))
+    if queue is None:
+        return False
+    queue.add(field, instance, increment)
+    return True
+
+
+def defer_bulk_update(field, pks):
+    """
+    Same as `defer_update`, but for `field.model` instances with `pks`
+    """
+    queue = get_queue(field.model)
+    if queue is None:
+        return False
+    queue.add_bulk(field, pks)
+    return True
+
+
+def perform_deferred_updates(queue):
+    # updates may be triggered in the process (see `post_update`), so
+    # they get into the same queue
+    with AbnormCache():
+        while queue:
+            queue.pop().write()
+
+
+async def aperform_deferred_updates(queue):
+    """
+    Async counterpart of `perform_deferred_updates`, entries of the same
+    rank are written concurrently
+    """
+    from asgiref.sync import sync_to_async
+    with AbnormCache():
+        while queue:
+            entries = queue.pop_rank()
+            await asyncio.gather(*[entry.awrite() for entry in entries])
+            # signal receivers are synchronous
+            await sync_to_async(queue.notify)(entries)
+
+
+def perform_commit_updates(key):
+    queue, _ = _local.commit_queues.pop(key)
+    with AbnormDeferrer():
+        _deferred_updates.get().extend(queue)
@@ -0,0 +1,243 @@
+"""
+Asynchronous recomputation of abnorm fields (see `asynchronous` field
+option and `ABNORM_ASYNC` setting)
+"""
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db import connections, router, transaction
+from django.utils.module_loading import import_string
+
+from .adapters import this_django
+from .utils import chunks, get_model_name
+
+
+BACKENDS = {
+    'thread': 'abnorm.tasks.ThreadPoolBackend',
+    'database': 'abnorm.tasks.DatabaseBackend',
+}
+
+_backends = {}
+
+logger = logging.getLogger('abnorm')
+
+
+def get_backend(name=None):
+    """
+    Returns jobs backend by name (see `BACKENDS`) or dotted path,
+    `ABNORM_ASYNC_BACKEND` setting is used by default
+    """
+    if name is None:
+        name = getattr(settings, 'ABNORM_ASYNC_BACKEND', 'thread')
+    if name not in _backends:
+        try:
+            backend = import_string(BACKENDS.get(name, name))()
+        except ImportError as e:
+            raise ImproperlyConfigured(
+                'Unable to load abnorm jobs backend %r: %s' % (name, e))
+        _backends[name] = backend
+    return _backends[name]
+
+
+def enqueue_update(field, pks):
+    """
+    Schedules `field` recomputation for `field.model` instances with `pks`,
+    jobs are passed to the backend once the current transaction is
+    committed
+    """
+    model_name = get_model_name(field.model)
+    jobs = [(model_name, pk, (field.name,)) for pk in pks]
+    if jobs:
+        transaction.on_commit(
+            lambda: get_backend().enqueue(jobs),
+            using=router.db_for_write(field.model))
+
+
+def coalesce_jobs(jobs):
+    # merges (model name, pk, field names) jobs for the same instance
+    result = OrderedDict()
+    for model_name, pk, field_names in jobs:
+        result.setdefault((model_name, pk), set()).update(field_names)
+    return result
+
+
+def perform_jobs(jobs):
+    """
+    Recomputes fields of (model name, pk, field names) `jobs`, instances of
+    the same model having the same fields recomputed are updated in bulk
+    """
+    from .bulk import update_values
+    groups = OrderedDict()
+    for (model_name, pk), field_names in coalesce_jobs(jobs).items():
+        key = (model_name, tuple(sorted(field_names)))
+        groups.setdefault(key, []).append(pk)
+
+    for (model_name, field_names), pks in groups.items():
+        try:
+            model = this_django.get_model(model_name)
+            fields = [model._meta.get_field(name) for name in field_names]
+        except (LookupError, FieldDoesNotExist) as e:
+            logger.warning('abnorm job skipped: %s', e)
+            continue
+        pks = [model._meta.pk.to_python(pk) for pk in pks]
+        update_values(model, fields, pks)
+
+
+class ThreadPoolBackend(object):
+    """
+    Performs jobs within the current process with a pool of
+    `ABNORM_ASYNC_WORKERS` threads, jobs are lost on process exit
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = OrderedDict()
+        self.executor = None
+
+    def enqueue(self, jobs):
+        with self.lock:
+            submit = not self.pending
+            for key, field_names in coalesce_jobs(jobs).items():
+                self.pending.setdefault(key, set()).update(field_names)
+            if submit and self.pending:
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(
+                        getattr(settings, 'ABNORM_ASYNC_WORKERS', 4))
+                self.executor.submit(self.run)
+
+    def run(self):
+        with self.lock:
+            jobs = [
+                (model_name, pk, field_names)
+                for (model_name, pk), field_names in self.pending.items()
+            ]
+            self.pending = OrderedDict()
+        try:
+            perform_jobs(jobs)
+        except Exception:
+            logger.exception('abnorm jobs failed')
+        finally:
+            # every thread has its own connections
+            connections.close_all()
+
+    def wait(self):
+        """
+        Waits for the jobs submitted so far to complete
+        """
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+class DatabaseBackend(object):
+    """
+    Keeps jobs in the `abnorm.UpdateJob` table, which is drained by
+    `abnorm_worker` management command
+    """
+
+    def enqueue(self, jobs):
+        from .models import UpdateJob
+        groups = OrderedDict()
+        for (model_name, pk), field_names in coalesce_jobs(jobs).items():
+            groups.setdefault(model_name, OrderedDict())[str(pk)] = (
+                field_names)
+
+        with transaction.atomic(using=router.db_for_write(UpdateJob)):
+            for model_name, pending in groups.items():
+                for chunk in chunks(pending):
+                    chunk = {pk: pending[pk] for pk in chunk}
+                    while chunk:
+                        new_pks = self.merge_jobs(model_name, chunk)
+                        UpdateJob.objects.bulk_create([
+                            UpdateJob(
+                                model=model_name, object_pk=pk,
+                                fields=','.join(sorted(chunk[pk])))
+                            for pk in new_pks
+                        ], ignore_conflicts=True)
+                        # jobs inserted concurrently are skipped by the
+                        # statement above, so fields are merged into them
+                        # with another pass, which is no-op for the
+                        # inserted ones
+                        chunk = {pk: chunk[pk] for pk in new_pks}
+
+    def merge_jobs(self, model_name, pending):
+        """
+        Adds {pk: field names} `pending` fields to existing jobs, returns
+        pks having no jobs
+        """
+        from .models import UpdateJob
+        existing = UpdateJob.objects.select_for_update().filter(
+            model=model_name, object_pk__in=list(pending))
+        new_pks = set(pending)
+        changed = []
+        for job in existing:
+            field_names = pending[job.object_pk]
+            new_pks.discard(job.object_pk)
+            names = set(job.fields.split(','))
+            if not field_names <= names:
+                job.fields = ','.join(sorted(names | field_names))
+                changed.append(job)
+        if changed:
+            UpdateJob.objects.bulk_update(changed, ['fields'])
+        return new_pks
+
+    def process(self, limit=100):
+        """
+        Performs up to `limit` oldest jobs, returns the number of them. Jobs
+        failing `ABNORM_ASYNC_MAX_ATTEMPTS` times are dropped
+        """
+        from .models import UpdateJob
+        using = router.db_for_write(UpdateJob)
+        max_attempts = getattr(settings, 'ABNORM_ASYNC_MAX_ATTEMPTS', 5)
+        with transaction.atomic(using=using):
+            queryset = UpdateJob.objects.order_by('pk')
+            if connections[using].features.has_select_for_update_skip_locked:
+                queryset = queryset.select_for_update(skip_locked=True)
+            jobs = list(queryset[:limit])
+            errors = {}
+            if self.perform(jobs, using) is not None:
+                # every job is retried within its own savepoint, so failing
+                # ones don't hold the others back
+                for job in jobs:
+                    error = self.perform([job], using)
+                    if error is not None:
+                        errors[job.pk] = error
+
+            done = []
+            for job in jobs:
+                error = errors.get(job.pk)
+                if error is None:
+                    done.append(job.pk)
+                    continue
+                job.attempts += 1
+                if job.attempts >= max_attempts:
+                    logger.error(
+                        'abnorm job %s dropped after %d attempts', job,
+                        job.attempts, exc_info=error)
+                    done.append(job.pk)
+                    continue
+                logger.warning(
+                    'abnorm job %s failed', job, exc_info=error)
+                job.error = '%s: %s' % (type(error).__name__, error)
+                job.save(update_fields=['attempts', 'error'])
+            UpdateJob.objects.filter(pk__in=done).delete()
+        return len(jobs)
+
+    def perform(self, jobs, using):
+        """
+        Performs `jobs` within a savepoint, returns the exception they have
+        failed with, if any
+        """
+        try:
+            with transaction.atomic(using=using):
+                perform_jobs(
+                    (job.model, job.object_pk, job.fields.split(','))
+                    for job in jobs)
+        except Exception as e:
+            return e
+        return None
@@ -0,0 +1,204 @@
+from django.db import router
+from django.db.backends.utils import truncate_name
+from django.db.migrations.operations.base import Operation
+from django.db.models import BooleanField, OuterRef, Subquery, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from django.db.models.sql import UpdateQuery
+
+from .adapters import this_django
+from .utils import get_local_field, iter_q_lookups
+
+
+SUPPORTED_VENDORS = ('postgresql', 'sqlite')
+
+
+def get_trigger_name(field, connection, suffix=''):
+    name = 'abnorm_%s_%s%s' % (field.model._meta.db_table, field.name, suffix)
+    return truncate_name(name, connection.ops.max_name_length())
+
+
+def get_foreign_key(field):
+    fk_attnames = this_django.get_field_backwards_attnames(field)
+    fk = None
+    if len(fk_attnames) == 1:
+        fk = field.rel_model._meta.get_field(field.backwards_name)
+    if fk is None or not (fk.many_to_one or fk.one_to_one):
+        raise ValueError(
+            '%s.%s: triggers are available for reverse foreign key '
+            'relations only' % (field.model.__name__, field.name))
+    return fk
+
+
+def get_update_columns(field, fk):
+    # related model columns the value depends on, `None` means all of them
+    lookups = [fk.name] + list(iter_q_lookups(field.filter))
+    if getattr(field, 'field_name', None):
+        lookups.append(field.field_name)
+
+    columns = []
+    for lookup in lookups:
+        f = get_local_field(field.rel_model, lookup)
+        if f is None:
+            # lookup may span another model
+            return None
+        if f.column not in columns:
+            columns.append(f.column)
+    return columns
+
+
+def get_update_sql(field, fk, row, schema_editor, condition=None):
+    """
+    Returns an UPDATE statement recomputing `field` value of the augmented
+    instance referenced by `row` ('NEW' or 'OLD') related model row,
+    performed if extra SQL `condition` holds
+    """
+    connection = schema_editor.connection
+    aggregate = field.get_trigger_aggregate()
+    if aggregate is None:
+        raise ValueError(
+            '%s.%s: qs_filter spanning multi-valued relations is not '
+            'supported by triggers' % (field.model.__name__, field.name))
+
+    target_attname = fk.target_field.attname
+    subquery = field.rel_model._base_manager.filter(**{
+        fk.attname: OuterRef(target_attname)
+    }).order_by().values(fk.attname).annotate(
+        abnorm=aggregate).values('abnorm')
+    value = Subquery(subquery)
+    # value of an empty relation, which has no rows to aggregate
+    empty_value = field.get_aggregate_value(None)
+    if empty_value is not None:
+        value = Coalesce(value, Value(empty_value, output_field=field))
+
+    queryset = field.model._base_manager.filter(**{
+        target_attname: RawSQL(
+            '%s.%s' % (row, connection.ops.quote_name(fk.column)), ())
+    })
+    if condition is not None:
+        # filtering by expressions requires django 3.0+
+        queryset = queryset.annotate(abnorm_condition=RawSQL(
+            condition, (), output_field=BooleanField())
+        ).filter(abnorm_condition=True)
+    query = queryset.query.chain(UpdateQuery)
+    query.add_update_values({field.name: value})
+    sql, params = query.get_compiler(connection=connection).as_sql()
+    return sql % tuple(schema_editor.quote_value(p) for p in params)
+
+
+def get_create_triggers_sql(field, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor not in SUPPORTED_VENDORS:
+        raise NotImplementedError(
+            'abnorm triggers are not available for %s' % connection.vendor)
+
+    fk = get_foreign_key(field)
+    table = connection.ops.quote_name(field.rel_model._meta.db_table)
+    columns = get_update_columns(field, fk)
+    update_of = ''
+    if columns:
+        update_of = ' OF %s' % ', '.join(
+            connection.ops.quote_name(c) for c in columns)
+    new_sql = get_update_sql(field, fk, 'NEW', schema_editor)
+    old_sql = get_update_sql(field, fk, 'OLD', schema_editor)
+    fk_changed = 'OLD.{fk} IS NOT NEW.{fk}'.format(
+        fk=connection.ops.quote_name(fk.column))
+
+    if connection.vendor == 'sqlite':
+        # previous augmented instance is updated if the relation is changed
+        moved_sql = get_update_sql(
+            field, fk, 'OLD', schema_editor, condition=fk_changed)
+        name = get_trigger_name(field, connection, '_insert')
+        yield (
+            'CREATE TRIGGER %s AFTER INSERT ON %s FOR EACH ROW '
+            'BEGIN %s; END' % (name, table, new_sql))
+        name = get_trigger_name(field, connection, '_update')
+        yield (
+            'CREATE TRIGGER %s AFTER UPDATE%s ON %s FOR EACH ROW '
+            'BEGIN %s; %s; END' % (
+                name, update_of, table, new_sql, moved_sql))
+        name = get_trigger_name(field, connection, '_delete')
+        yield (
+            'CREATE TRIGGER %s AFTER DELETE ON %s FOR EACH ROW '
+            'BEGIN %s; END' % (name, table, old_sql))
+        return
+
+    function = get_trigger_name(field, connection, '_fn')
+    fk_changed = fk_changed.replace(' IS NOT ', ' IS DISTINCT FROM ')
+    yield (
+        'CREATE OR REPLACE FUNCTION %s() RETURNS trigger AS $$ '
+        'BEGIN '
+        "IF TG_OP IN ('INSERT', 'UPDATE') THEN %s; END IF; "
+        "IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND %s) THEN %s; END IF; "
+        'RETURN NULL; '
+        'END; $$ LANGUAGE plpgsql' % (function, new_sql, fk_changed, old_sql))
+    yield (
+        'CREATE TRIGGER %s AFTER INSERT OR UPDATE%s OR DELETE ON %s '
+        'FOR EACH ROW EXECUTE PROCEDURE %s()' % (
+            get_trigger_name(field, connection), update_of, table, function))
+
+
+def get_drop_triggers_sql(field, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        for suffix in ('_insert', '_update', '_delete'):
+            yield 'DROP TRIGGER IF EXISTS %s' % get_trigger_name(
+                field, connection, suffix)
+    else:
+        yield 'DROP TRIGGER IF EXISTS %s ON %s' % (
+            get_trigger_name(field, connection),
+            connection.ops.quote_name(field.rel_model._meta.db_table))
+        yield 'DROP FUNCTION IF EXISTS %s()' % get_trigger_name(
+            field, connection, '_fn')
+
+
+class CreateTriggers(Operation):
+    """
+    Migration operation creating database triggers which maintain
+    `CountField`, `SumField` or `AvgField` value (use `triggers=True` field
+    option to disable signal handlers for it), e.g.
+
+        migrations.AddField('post', 'comment_count', ...),
+        CreateTriggers('post', 'comment_count'),
+    """
+
+    reversible = True
+
+    def __init__(self, model_name, name):
+        self.model_name = model_name
+        self.name = name
+
+    def deconstruct(self):
+        return self.__class__.__name__, [self.model_name, self.name], {}
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def get_field(self, app_label, state):
+        # historical field, so triggers match the migration they belong to
+        model = state.apps.get_model(app_label, self.model_name)
+        return model._meta.get_field(self.name)
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        field = self.get_field(app_label, to_state)
+        if not router.allow_migrate_model(
+                schema_editor.connection.alias, field.model):
+            return
+        for sql in get_drop_triggers_sql(field, schema_editor):
+            schema_editor.execute(sql)
+        for sql in get_create_triggers_sql(field, schema_editor):
+            schema_editor.execute(sql)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        field = self.get_field(app_label, from_state)
+        if not router.allow_migrate_model(
+                schema_editor.connection.alias, field.model):
+            return
+        for sql in get_drop_triggers_sql(field, schema_editor):
+            schema_editor.execute(sql)
+
+    def describe(self):
+        return 'Create abnorm triggers for %s.%s' % (
+            self.model_name, self.name)
@@ -1,20 +1,99 @@
 import json
 from decimal import Decimal
+from functools import total_ordering
 
+from django.core.exceptions import FieldDoesNotExist
 from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
 
 
 def reload_model_instance(instance):
     return type(instance)._base_manager.get(pk=instance.pk)
 
 
+def chunks(items, size=1000):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
 def get_model_name(model):
     return '%s.%s' % (model._meta.app_label, model._meta.object_name)
 
 
+json_encoder = DjangoJSONEncoder()
+
+
 def dumps(value):
-    return DjangoJSONEncoder().encode(value)
+    return json_encoder.encode(value)
 
 
 def loads(txt):
     return json.loads(txt, parse_float=Decimal)
+
+
+def prefix_q(q, prefix):
+    # make `q` lookups relative to another model, e.g. `prefix='items__'`
+    result = Q()
+    result.connector = q.connector
+    result.negated = q.negated
+    for child in q.children:
+        if isinstance(child, Q):
+            result.children.append(prefix_q(child, prefix))
+        else:
+            result.children.append((prefix + child[0], child[1]))
+    return result
+
+
+def iter_q_lookups(q):
+    for child in q.children:
+        if isinstance(child, Q):
+            for lookup in iter_q_lookups(child):
+                yield lookup
+        else:
+            yield child[0]
+
+
+@total_ordering
+class Descending(object):
+    # sort key component ordering `value` in reverse
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+def get_local_field(model, lookup):
+    # concrete `model` field `lookup` is based on, None if it spans another
+    # model or doesn't refer to a concrete field
+    name = lookup.split('__')[0]
+    opts = model._meta
+    try:
+        field = opts.pk if name == 'pk' else opts.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    if not field.concrete or (field.is_relation and name != lookup):
+        return None
+    return field
+
+
+def is_single_valued_lookup(model, lookup):
+    # whether `lookup` doesn't span many-to-many or reverse fk relations
+    opts = model._meta
+    for part in lookup.split('__'):
+        try:
+            field = opts.get_field(part)
+        except FieldDoesNotExist:
+            # pk alias, lookup or transform
+            return True
+        if field.many_to_many or field.one_to_many:
+            return False
+        if not field.is_relation:
+            return True
+        opts = field.related_model._meta
+    return True
@@ -0,0 +1,23 @@
+import abnorm.fields
+from django.db import migrations
+import django.db.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testobj',
+            name='rto_item_values_inc_sum',
+            field=abnorm.fields.SumField(blank=True, default=0, field_name='value', internal_type=django.db.models.fields.IntegerField, null=True, relation_name='rto_items'),
+        ),
+        migrations.AddField(
+            model_name='testobj',
+            name='rto_items_inc_count',
+            field=abnorm.fields.CountField(blank=True, default=0, null=True, relation_name='rto_items'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+import abnorm.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0002_incremental_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testobj',
+            name='rto_first_2_items_binary',
+            field=abnorm.fields.BinaryRelationField(blank=True, default=[], fields=('id', 'value'), limit=2, null=True, relation_name='rto_items', serializer='json'),
+        ),
+    ]
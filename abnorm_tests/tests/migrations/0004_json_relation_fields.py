@@ -0,0 +1,25 @@
+import abnorm.fields
+from django.db import migrations
+
+from abnorm.adapters import this_django
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0003_binary_relation_field'),
+    ]
+
+    # JSONRelationField requires django 3.1+
+    operations = [] if this_django.JSONField is None else [
+        migrations.AddField(
+            model_name='testobj',
+            name='rto_first_2_items_json',
+            field=abnorm.fields.JSONRelationField(blank=True, default=list, fields=('id', 'value'), limit=2, null=True, relation_name='rto_items'),
+        ),
+        migrations.AddField(
+            model_name='testobj',
+            name='rto_first_item_json',
+            field=abnorm.fields.JSONRelationField(blank=True, default=None, fields=('id', 'value', 'test_obj_id'), flat=True, limit=1, null=True, relation_name='rto_items'),
+        ),
+    ]
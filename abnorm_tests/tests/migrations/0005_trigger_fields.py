@@ -0,0 +1,34 @@
+import abnorm.fields
+from django.db import migrations
+import django.db.models.fields
+import django.db.models.query_utils
+
+import abnorm.triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0004_json_relation_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testobj',
+            name='rto_item_values_trigger_sum',
+            field=abnorm.fields.SumField(blank=True, default=0, field_name='value', internal_type=django.db.models.fields.IntegerField, null=True, relation_name='rto_items'),
+        ),
+        migrations.AddField(
+            model_name='testobj',
+            name='rto_items_qsf_trigger_count',
+            field=abnorm.fields.CountField(blank=True, default=0, null=True, qs_filter=django.db.models.query_utils.Q(('value', 1)), relation_name='rto_items'),
+        ),
+        migrations.AddField(
+            model_name='testobj',
+            name='rto_items_trigger_count',
+            field=abnorm.fields.CountField(blank=True, default=0, null=True, relation_name='rto_items'),
+        ),
+        abnorm.triggers.CreateTriggers('testobj', 'rto_item_values_trigger_sum'),
+        abnorm.triggers.CreateTriggers('testobj', 'rto_items_qsf_trigger_count'),
+        abnorm.triggers.CreateTriggers('testobj', 'rto_items_trigger_count'),
+    ]
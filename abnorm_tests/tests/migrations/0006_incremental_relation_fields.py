@@ -0,0 +1,35 @@
+import abnorm.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0005_trigger_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankedTestObj',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('top_2_items', abnorm.fields.RelationField(blank=True, default=[], fields=('id', 'value'), limit=2, null=True, relation_name='items')),
+                ('top_item', abnorm.fields.RelationField(blank=True, default=None, fields=('id', 'value'), flat=True, limit=1, null=True, relation_name='items')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='RankedRelatedTestObj',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.IntegerField(default=0)),
+                ('test_obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='tests.rankedtestobj')),
+            ],
+            options={
+                'ordering': ('-value',),
+            },
+        ),
+    ]
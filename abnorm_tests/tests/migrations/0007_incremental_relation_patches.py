@@ -0,0 +1,33 @@
+import abnorm.fields
+from django.db import migrations, models
+
+from abnorm.adapters import this_django
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0006_incremental_relation_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rankedrelatedtestobj',
+            name='name',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='rankedtestobj',
+            name='all_items',
+            field=abnorm.fields.RelationField(blank=True, default=[], fields=('id', 'value', 'name'), null=True, relation_name='items'),
+        ),
+    ]
+
+    # JSONRelationField requires django 3.1+
+    operations += [] if this_django.JSONField is None else [
+        migrations.AddField(
+            model_name='rankedtestobj',
+            name='all_items_json',
+            field=abnorm.fields.JSONRelationField(blank=True, default=list, fields=('id', 'value', 'name'), null=True, relation_name='items'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+import abnorm.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0007_incremental_relation_patches'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='testobj',
+            name='rto_items_qsf_count',
+            field=abnorm.fields.CountField(blank=True, default=0, null=True, qs_filter=models.Q(('value', 1)), relation_name='rto_items'),
+        ),
+        migrations.AlterField(
+            model_name='testobj',
+            name='rto_items_qsfq_count',
+            field=abnorm.fields.CountField(blank=True, default=0, null=True, qs_filter=models.Q(('value', 1)), relation_name='rto_items'),
+        ),
+    ]
@@ -2,7 +2,10 @@ from django.db import models
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import fields
 
-from abnorm import SumField, CountField, RelationField
+from abnorm import (
+    SumField, CountField, RelationField, BinaryRelationField,
+    JSONRelationField, AbnormManager)
+from abnorm.adapters import this_django
 
 
 class BaseModel(models.Model):
@@ -34,10 +37,25 @@ class TestObj(BaseModel):
     rto_items_count = CountField('rto_items')
     rto_items_qsf_count = CountField('rto_items', qs_filter={'value': 1})
     rto_items_qsfq_count = CountField('rto_items', qs_filter=models.Q(value=1))
+    rto_items_inc_count = CountField('rto_items', incremental=True)
+    rto_item_values_inc_sum = SumField('rto_items', 'value', incremental=True)
+    rto_items_trigger_count = CountField('rto_items', triggers=True)
+    rto_items_qsf_trigger_count = CountField(
+        'rto_items', qs_filter={'value': 1}, triggers=True)
+    rto_item_values_trigger_sum = SumField(
+        'rto_items', 'value', triggers=True)
     rto_first_item = RelationField(
         'rto_items', fields=('id', 'value', 'test_obj_id'), limit=1, flat=True)
     rto_first_2_items = RelationField(
         'rto_items', fields=('id', 'value'), limit=2)
+    rto_first_2_items_binary = BinaryRelationField(
+        'rto_items', fields=('id', 'value'), limit=2, serializer='json')
+    if this_django.JSONField is not None:
+        rto_first_item_json = JSONRelationField(
+            'rto_items', fields=('id', 'value', 'test_obj_id'), limit=1,
+            flat=True)
+        rto_first_2_items_json = JSONRelationField(
+            'rto_items', fields=('id', 'value'), limit=2)
 
     nrto_item_values_sum = SumField('nrto_items', 'value')
     nrto_items_count = CountField('nrto_items')
@@ -88,6 +106,8 @@ class RelatedTestObj(BaseModel):
     test_obj_wo_related_name = models.ForeignKey(
         TestObj, on_delete=models.CASCADE, null=True)
 
+    objects = AbnormManager()
+
     class Meta:
         ordering = ('id',)
 
@@ -111,14 +131,41 @@ class GenericRelatedTestObj(BaseModel):
     m2m_first_item = RelationField(
         'm2m_items', fields=('id', 'value'), limit=1, flat=True)
 
+    objects = AbnormManager()
+
     class Meta:
         ordering = ('id',)
 
 
+class RankedTestObj(BaseModel):
+    top_2_items = RelationField(
+        'items', fields=('id', 'value'), limit=2, incremental=True)
+    top_item = RelationField(
+        'items', fields=('id', 'value'), limit=1, flat=True,
+        incremental=True)
+    all_items = RelationField(
+        'items', fields=('id', 'value', 'name'), incremental=True)
+    if this_django.JSONField is not None:
+        all_items_json = JSONRelationField(
+            'items', fields=('id', 'value', 'name'), incremental=True)
+
+
+class RankedRelatedTestObj(BaseModel):
+    value = models.IntegerField(default=0)
+    name = models.CharField(max_length=100, default='')
+    test_obj = models.ForeignKey(
+        RankedTestObj, related_name='items', on_delete=models.CASCADE)
+
+    class Meta:
+        ordering = ('-value',)
+
+
 class M2MTestObj(BaseModel):
     value = models.IntegerField(default=0)
     testobj_items_count = CountField('testobj_set')
 
+    objects = AbnormManager()
+
     class Meta:
         ordering = ('id',)
 
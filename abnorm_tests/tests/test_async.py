@@ -0,0 +1,82 @@
+from unittest import skipIf
+
+from django import VERSION as DJANGO_VERSION
+from django.test import TestCase
+
+from .models import TestParentObj, TestObj, RelatedTestObj, M2MTestObj
+
+from abnorm import AbnormBlocker, AbnormDeferrer
+from abnorm.fields import (
+    aget_denormalized_values, get_denormalized_values, sync_to_async)
+from abnorm.utils import reload_model_instance
+
+
+def get_field(name):
+    return TestObj._meta.get_field(name)
+
+
+@skipIf(DJANGO_VERSION < (3, 1), 'async tests require django 3.1+')
+class AsyncUpdatesTestCase(TestCase):
+    def setUp(self):
+        self.grandparent = TestParentObj.objects.create()
+        self.parent = TestParentObj.objects.create(parent=self.grandparent)
+        self.test_obj = TestObj.objects.create(parent=self.parent)
+        with AbnormBlocker():
+            self.rto1 = RelatedTestObj.objects.create(
+                test_obj=self.test_obj, value=1)
+            self.rto2 = RelatedTestObj.objects.create(
+                test_obj=self.test_obj, value=2)
+
+    async def test_get_denormalized_value(self):
+        for name in ('rto_items_count', 'rto_item_values_sum',
+                     'rto_first_item', 'rto_first_2_items'):
+            field = get_field(name)
+            value = await field.aget_denormalized_value(self.test_obj)
+            expected = await sync_to_async(field.get_denormalized_value)(
+                self.test_obj)
+            self.assertEqual(value, expected)
+
+    async def test_get_denormalized_values(self):
+        fields = [
+            get_field(name) for name in (
+                'rto_items_count', 'rto_items_qsf_count',
+                'rto_item_values_sum', 'rto_first_item', 'nrto_items_count')
+        ]
+        values = await aget_denormalized_values(self.test_obj, fields)
+        expected = await sync_to_async(get_denormalized_values)(
+            self.test_obj, fields)
+        self.assertEqual(values, expected)
+        self.assertEqual(values['rto_items_count'], 2)
+        self.assertEqual(values['rto_item_values_sum'], 3)
+
+    async def test_update_value(self):
+        await get_field('rto_items_count').aupdate_value(self.test_obj)
+        test_obj = await sync_to_async(reload_model_instance)(self.test_obj)
+        self.assertEqual(test_obj.rto_items_count, 2)
+        # other fields are left intact
+        self.assertEqual(test_obj.rto_item_values_sum, 0)
+
+    async def test_deferred_updates(self):
+        async with AbnormDeferrer():
+            await sync_to_async(RelatedTestObj.objects.create)(
+                test_obj=self.test_obj, value=3)
+        test_obj = await sync_to_async(reload_model_instance)(self.test_obj)
+        self.assertEqual(test_obj.rto_items_count, 3)
+        self.assertEqual(test_obj.rto_item_values_sum, 6)
+        self.assertEqual(test_obj.rto_first_item, self.rto1)
+
+    async def test_cascade(self):
+        m2m_obj = await sync_to_async(M2MTestObj.objects.create)(value=1)
+        async with AbnormDeferrer():
+            await sync_to_async(self.test_obj.m2m_items.add)(m2m_obj)
+
+        test_obj = await sync_to_async(reload_model_instance)(self.test_obj)
+        self.assertEqual(test_obj.m2m_first_2_items, [m2m_obj])
+        parent = await sync_to_async(reload_model_instance)(self.parent)
+        self.assertEqual(
+            parent.all_test_objs[0].m2m_first_2_items, [m2m_obj])
+        grandparent = await sync_to_async(reload_model_instance)(
+            self.grandparent)
+        self.assertEqual(
+            grandparent.all_children[0].all_test_objs[0].m2m_first_2_items,
+            [m2m_obj])
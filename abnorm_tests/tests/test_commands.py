@@ -1,5 +1,12 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.db import connection, connections
 from django.test import TestCase
-from django.core.management import call_command
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command, CommandError
 
 from .models import (
     TestObj, RelatedTestObj, NullRelatedTestObj, GenericRelatedTestObj,
@@ -36,7 +43,7 @@ class UpdateFieldsCommandTestCase(TestCase):
 
             # lets update data in our db with signal-free update statement
             # to suppress normal abnorm behavior
-            type(obj).objects.filter(pk=obj.pk).update(value=999)
+            type(obj)._base_manager.filter(pk=obj.pk).update(value=999)
 
             # make sure denormalized field value was not updated
             self.test_obj = reload_model_instance(self.test_obj)
@@ -58,7 +65,7 @@ class UpdateFieldsCommandTestCase(TestCase):
     def test_uses_post_update_signal(self):
         # lets update data in our db with signal-free update statement
         # to suppress normal abnorm behavior
-        type(self.m2m).objects.filter(pk=self.m2m.pk).update(value=999)
+        type(self.m2m)._base_manager.filter(pk=self.m2m.pk).update(value=999)
 
         # run update fields command
         call_command(
@@ -71,15 +78,32 @@ class UpdateFieldsCommandTestCase(TestCase):
         denormed_obj = self.test_parent_obj.first_test_obj.m2m_first_item
         self.assertEqual(denormed_obj.value, 999)
 
+    def test_loads_only_required_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            call_command(
+                'update_abnorm_fields', 'tests.TestObj.rto_first_item')
+
+        selects = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('SELECT "tests_testobj"."id"') and
+            'LIMIT 1000' in q['sql']]
+        self.assertEqual(len(selects), 1)
+        self.assertNotIn('"tests_testobj"."grto_first_item"', selects[0])
+
+        # no upfront queries to figure out the table size
+        for q in ctx.captured_queries:
+            self.assertNotIn('COUNT(*)', q['sql'])
+            self.assertNotIn('DESC', q['sql'])
+
     def test_updates_only_listed_fields(self):
         # abnorm is smart enough to update all instance's fields on save
         # unfortunately that creates heavy update queries
 
         # lets update data in our db with signal-free update statement
         # to suppress normal abnorm behavior
-        type(self.rto).objects.filter(pk=self.rto.pk).update(value=999)
-        type(self.grto).objects.filter(pk=self.grto.pk).update(value=999)
-        type(self.nrto).objects.filter(pk=self.grto.pk).update(value=999)
+        type(self.rto)._base_manager.filter(pk=self.rto.pk).update(value=999)
+        type(self.grto)._base_manager.filter(pk=self.grto.pk).update(value=999)
+        type(self.nrto)._base_manager.filter(pk=self.grto.pk).update(value=999)
 
         # this DOES NOT update nrto field
         call_command(
@@ -94,3 +118,191 @@ class UpdateFieldsCommandTestCase(TestCase):
 
         # nrto field was NOT updated
         self.assertNotEqual(self.test_obj.nrto_first_item.value, 999)
+
+
+class BulkUpdateFieldsCommandTestCase(TestCase):
+    def setUp(self):
+        self.test_objs = [TestObj.objects.create() for i in range(3)]
+        for i, test_obj in enumerate(self.test_objs):
+            for value in range(i + 1):
+                RelatedTestObj.objects.create(test_obj=test_obj, value=value)
+            GenericRelatedTestObj.objects.create(
+                content_object=test_obj, value=i)
+            test_obj.m2m_items.add(M2MTestObj.objects.create(value=i))
+
+        # lets break denormalized data with signal-free update statement
+        TestObj.objects.update(
+            rto_items_count=0, rto_items_qsf_count=0, rto_item_values_sum=0,
+            grto_items_count=0, m2m_item_values_sum=0)
+
+    def test_updates_aggregate_fields(self):
+        call_command(
+            'update_abnorm_fields',
+            'tests.TestObj.rto_items_count',
+            'tests.TestObj.rto_items_qsf_count',
+            'tests.TestObj.rto_item_values_sum',
+            'tests.TestObj.grto_items_count',
+            'tests.TestObj.m2m_item_values_sum',
+        )
+
+        for i, test_obj in enumerate(self.test_objs):
+            test_obj = reload_model_instance(test_obj)
+            self.assertEqual(test_obj.rto_items_count, i + 1)
+            self.assertEqual(test_obj.rto_items_qsf_count, int(i > 0))
+            self.assertEqual(test_obj.rto_item_values_sum, sum(range(i + 1)))
+            self.assertEqual(test_obj.grto_items_count, 1)
+            self.assertEqual(test_obj.m2m_item_values_sum, i)
+
+    def test_uses_set_based_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            call_command(
+                'update_abnorm_fields',
+                'tests.TestObj.rto_items_count',
+                'tests.TestObj.rto_item_values_sum',
+            )
+
+        updates = [
+            q for q in ctx.captured_queries
+            if q['sql'].startswith('UPDATE "tests_testobj"')]
+        self.assertEqual(len(updates), 1)
+
+        aggregates = [
+            q for q in ctx.captured_queries
+            if 'COUNT(' in q['sql'] and 'GROUP BY' in q['sql']]
+        self.assertEqual(len(aggregates), 1)
+
+
+class InlinePool(object):
+    """
+    Stands in for a process pool, tasks are performed by the current process
+    (test database isn't shared with the forked ones) in reverse order
+    """
+
+    def __init__(self, processes):
+        self.processes = processes
+
+    def imap_unordered(self, func, tasks):
+        return reversed([func(task) for task in tasks])
+
+    def terminate(self):
+        pass
+
+    def join(self):
+        pass
+
+
+class ChunkedUpdateFieldsCommandTestCase(TestCase):
+    def setUp(self):
+        self.test_objs = [TestObj.objects.create() for i in range(5)]
+        for test_obj in self.test_objs:
+            RelatedTestObj.objects.create(test_obj=test_obj, value=1)
+        TestObj.objects.update(rto_items_count=0)
+
+        fd, self.checkpoint = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, self.checkpoint)
+
+    def get_counts(self):
+        return [
+            reload_model_instance(test_obj).rto_items_count
+            for test_obj in self.test_objs
+        ]
+
+    def test_writes_checkpoint(self):
+        call_command(
+            'update_abnorm_fields', 'tests.TestObj.rto_items_count',
+            chunk_size=2, checkpoint=self.checkpoint)
+
+        self.assertEqual(self.get_counts(), [1] * 5)
+        with open(self.checkpoint) as f:
+            ranges = [json.loads(line) for line in f]
+        self.assertEqual(len(ranges), 3)
+        for r in ranges:
+            self.assertEqual(r['model'], 'tests.TestObj')
+            self.assertEqual(r['fields'], ['rto_items_count'])
+        self.assertEqual(sorted(
+            TestObj.objects.filter(
+                pk__gte=r['start'], pk__lt=r['stop']).count()
+            for r in ranges
+        ), [1, 2, 2])
+
+    def test_sparse_pks(self):
+        test_obj = TestObj.objects.create(pk=self.test_objs[-1].pk + 10 ** 6)
+        RelatedTestObj.objects.create(test_obj=test_obj, value=1)
+        self.test_objs.append(test_obj)
+        TestObj.objects.update(rto_items_count=0)
+
+        with CaptureQueriesContext(connection) as ctx:
+            call_command(
+                'update_abnorm_fields', 'tests.TestObj.rto_items_count',
+                chunk_size=2, checkpoint=self.checkpoint)
+        self.assertLess(len(ctx.captured_queries), 50)
+        self.assertEqual(self.get_counts(), [1] * 6)
+        with open(self.checkpoint) as f:
+            self.assertEqual(len(f.readlines()), 3)
+
+    def test_resume_skips_completed_ranges(self):
+        call_command(
+            'update_abnorm_fields', 'tests.TestObj.rto_items_count',
+            chunk_size=2, checkpoint=self.checkpoint)
+
+        # break data again and pretend the last range wasn't completed
+        TestObj.objects.update(rto_items_count=0)
+        with open(self.checkpoint) as f:
+            lines = f.readlines()
+        last = max(lines, key=lambda line: json.loads(line)['start'])
+        lines.remove(last)
+        with open(self.checkpoint, 'w') as f:
+            f.writelines(lines)
+
+        call_command(
+            'update_abnorm_fields', 'tests.TestObj.rto_items_count',
+            chunk_size=2, checkpoint=self.checkpoint, resume=True)
+
+        last = json.loads(last)
+        expected = [
+            int(last['start'] <= test_obj.pk < last['stop'])
+            for test_obj in self.test_objs
+        ]
+        self.assertEqual(self.get_counts(), expected)
+
+    def test_workers(self):
+        context = mock.Mock(Pool=InlinePool)
+        with mock.patch('multiprocessing.get_context',
+                        return_value=context) as get_context, \
+                mock.patch.object(connections, 'close_all'):
+            call_command(
+                'update_abnorm_fields', 'tests.TestObj.rto_items_count',
+                chunk_size=2, workers=3, checkpoint=self.checkpoint)
+            get_context.assert_called_with('fork')
+            self.assertEqual(self.get_counts(), [1] * 5)
+
+            # ranges completed out of order are resumed all the same
+            TestObj.objects.update(rto_items_count=0)
+            with open(self.checkpoint) as f:
+                lines = f.readlines()
+            self.assertEqual(len(lines), 3)
+            first = min(lines, key=lambda line: json.loads(line)['start'])
+            lines.remove(first)
+            with open(self.checkpoint, 'w') as f:
+                f.writelines(lines)
+
+            call_command(
+                'update_abnorm_fields', 'tests.TestObj.rto_items_count',
+                chunk_size=2, workers=3, checkpoint=self.checkpoint,
+                resume=True)
+
+        first = json.loads(first)
+        expected = [
+            int(first['start'] <= test_obj.pk < first['stop'])
+            for test_obj in self.test_objs
+        ]
+        self.assertEqual(self.get_counts(), expected)
+        with open(self.checkpoint) as f:
+            self.assertEqual(len(f.readlines()), 3)
+
+    def test_resume_requires_checkpoint(self):
+        with self.assertRaises(CommandError):
+            call_command(
+                'update_abnorm_fields', 'tests.TestObj.rto_items_count',
+                resume=True)
@@ -1,14 +1,32 @@
-from django.test import TestCase
+import threading
+from unittest import mock, skipIf
+
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, override_settings
+from django.db.models.signals import (
+    pre_save, post_save, post_delete, post_init)
+from django.test.utils import CaptureQueriesContext
 
 from .models import (
     TestObj, RelatedTestObj, NullRelatedTestObj, GenericRelatedTestObj,
-    M2MTestObj, TestParentObj, IgnoredTestObj,
+    M2MTestObj, TestParentObj, IgnoredTestObj, RankedTestObj,
+    RankedRelatedTestObj,
 )
 
+from abnorm import (
+    AbnormCache, AbnormDeferrer, CountField, RelationField, state)
+from abnorm.fields import (
+    post_update, post_bulk_update, LazyRelationValue,
+    get_denormalized_values)
 from abnorm.utils import reload_model_instance
 from abnorm.adapters import this_django
 
 
+def count_updates(queries, model):
+    prefix = 'UPDATE "%s"' % model._meta.db_table
+    return len([q for q in queries if q['sql'].startswith(prefix)])
+
+
 class FKRelationTestCase(TestCase):
     def setUp(self):
         self.test_obj = TestObj.objects.create()
@@ -74,6 +92,60 @@ class FKRelationTestCase(TestCase):
     def test_sum_field(self):
         self.assertEqual(self.test_obj.rto_item_values_sum, 7)
 
+    def test_sum_field_relation_changed(self):
+        self.fm3.test_obj = self.test_obj2
+        self.fm3.save()
+        self.test_obj = reload_model_instance(self.test_obj)
+        self.test_obj2 = reload_model_instance(self.test_obj2)
+        self.assertEqual(self.test_obj.rto_item_values_sum, 3)
+        self.assertEqual(self.test_obj2.rto_item_values_sum, 12)
+        self.assertEqual(
+            self.test_obj2.rto_first_2_items, [self.fm3, self.fm4])
+
+    def test_save_doesnt_fetch_original_instance(self):
+        fm1 = RelatedTestObj.objects.get(pk=self.fm1.pk)
+        fm1.test_obj = self.test_obj2
+        with CaptureQueriesContext(connection) as ctx:
+            fm1.save()
+        pk_lookup = (
+            'FROM "tests_relatedtestobj" '
+            'WHERE "tests_relatedtestobj"."id" =')
+        self.assertFalse(
+            [q for q in ctx.captured_queries if pk_lookup in q['sql']])
+
+        self.test_obj = reload_model_instance(self.test_obj)
+        self.test_obj2 = reload_model_instance(self.test_obj2)
+        self.assertEqual(self.test_obj.rto_items_count, 3)
+        self.assertEqual(self.test_obj2.rto_items_count, 2)
+
+    def test_save_without_relevant_changes_skips_updates(self):
+        fm1 = RelatedTestObj.objects.get(pk=self.fm1.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            fm1.save()
+        self.assertEqual(count_updates(ctx.captured_queries, TestObj), 0)
+
+        fm1.value = 100
+        with CaptureQueriesContext(connection) as ctx:
+            fm1.save(update_fields=['test_obj_wo_related_name'])
+        self.assertEqual(count_updates(ctx.captured_queries, TestObj), 0)
+
+    def test_save_with_relevant_update_fields(self):
+        fm1 = RelatedTestObj.objects.get(pk=self.fm1.pk)
+        fm1.value = 100
+        fm1.save(update_fields=['value'])
+        self.test_obj = reload_model_instance(self.test_obj)
+        self.assertEqual(self.test_obj.rto_item_values_sum, 106)
+        self.assertEqual(self.test_obj.rto_first_2_items[1].value, 100)
+
+    def test_dependency_fields(self):
+        field = TestObj._meta.get_field('rto_items_qsf_count')
+        self.assertEqual(
+            [f.name for f in field.dependency_fields], ['test_obj', 'value'])
+        field = TestObj._meta.get_field('rto_first_item')
+        self.assertEqual(
+            [f.name for f in field.dependency_fields],
+            ['test_obj', 'id', 'value'])
+
     def test_sum_field_for_relation_with_default_relation_name(self):
         RelatedTestObj.objects.create(
             value=17, test_obj_wo_related_name=self.test_obj,
@@ -93,6 +165,15 @@ class FKRelationTestCase(TestCase):
         self.assertEqual(
             self.test_obj.rto_first_item.test_obj.pk, self.test_obj.pk)
 
+    def test_update_with_instance_value(self):
+        TestObj.objects.filter(pk=self.test_obj2.pk).update(
+            rto_first_item=self.fm1)
+        self.test_obj2 = reload_model_instance(self.test_obj2)
+        self.assertEqual(self.test_obj2.rto_first_item, self.fm1)
+        self.assertEqual(self.test_obj2.rto_first_item.value, 1)
+        # the method is patched once per class
+        self.assertNotIn('prepare_database_save', self.fm1.__dict__)
+
     def test_altering_rto_first_item_attr_updates_itself(self):
         denormalized_item = self.test_obj.rto_first_item
         denormalized_item.value = 666
@@ -102,6 +183,380 @@ class FKRelationTestCase(TestCase):
         self.assertEqual(self.test_obj.rto_first_item.value, 666)
 
 
+class LazyDeserializationTestCase(TestCase):
+    def setUp(self):
+        test_obj = TestObj.objects.create()
+        self.rto = RelatedTestObj.objects.create(value=1, test_obj=test_obj)
+        self.test_obj = reload_model_instance(test_obj)
+
+    def test_value_is_deserialized_on_access(self):
+        self.assertIsInstance(
+            self.test_obj.__dict__['rto_first_2_items'], LazyRelationValue)
+        self.assertIsInstance(self.test_obj.rto_first_2_items, list)
+        self.assertIsInstance(
+            self.test_obj.__dict__['rto_first_2_items'], list)
+        self.assertEqual(self.test_obj.rto_first_2_items, [self.rto])
+
+    def test_item_fields_have_python_types(self):
+        item = self.test_obj.rto_first_item
+        self.assertIs(type(item.value), int)
+        self.assertEqual(item.test_obj_id, self.test_obj.pk)
+
+    def test_values_list_is_deserialized(self):
+        value = TestObj.objects.filter(pk=self.test_obj.pk).values_list(
+            'rto_first_2_items', flat=True).get()
+        self.assertIs(type(value), list)
+        self.assertEqual(value, [self.rto])
+        row = TestObj.objects.filter(pk=self.test_obj.pk).values(
+            'rto_first_item').get()
+        self.assertIs(type(row['rto_first_item']), RelatedTestObj)
+
+
+class ItemsQueryTestCase(TestCase):
+    def setUp(self):
+        self.parent = TestParentObj.objects.create()
+        self.test_objs = [
+            TestObj.objects.create(parent=self.parent) for i in range(5)]
+        for test_obj in self.test_objs:
+            test_obj.m2m_items.add(M2MTestObj.objects.create(value=1))
+            RelatedTestObj.objects.create(test_obj=test_obj, value=1)
+
+    def serialize(self, field, instance):
+        with CaptureQueriesContext(connection) as ctx:
+            raw = field.serialize_value(field.get_denormalized_value(instance))
+        return raw, ctx.captured_queries
+
+    def test_nested_values_use_single_query(self):
+        field = TestParentObj._meta.get_field('all_test_objs')
+        raw, queries = self.serialize(field, self.parent)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(field.loads(raw)), 5)
+
+    def test_listed_columns_loaded_only(self):
+        field = TestObj._meta.get_field('rto_first_2_items')
+        raw, queries = self.serialize(field, self.test_objs[0])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('test_obj_wo_related_name_id', queries[0]['sql'])
+        self.assertEqual(field.loads(raw)[0]['value'], 1)
+
+    def test_forward_relation_serialized_as_pk(self):
+        field = RelationField(
+            'rto_items', fields=('id', 'test_obj'), limit=2)
+        field.set_attributes_from_name('field')
+        field.model = TestObj
+        test_obj = self.test_objs[0]
+        raw, queries = self.serialize(field, test_obj)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(field.loads(raw)[0]['test_obj'], test_obj.pk)
+        item = field.deserialize_value(raw)[0]
+        self.assertEqual(item.test_obj_id, test_obj.pk)
+
+    def test_computed_from_rows(self):
+        inits = []
+
+        def receiver(sender, **kwargs):
+            inits.append(sender)
+
+        post_init.connect(receiver, sender=RelatedTestObj)
+        try:
+            for name in ('rto_first_item', 'rto_first_2_items'):
+                del inits[:]
+                field = TestObj._meta.get_field(name)
+                value = field.get_computed_value(self.test_objs[0])
+                self.assertIsInstance(value, LazyRelationValue)
+                self.assertFalse(inits)
+                expected = field.get_denormalized_value(self.test_objs[0])
+                self.assertEqual(
+                    field.get_prep_value(value),
+                    field.get_prep_value(expected))
+                # deserialized when accessed through augmented instance
+                setattr(self.test_objs[1], name, value)
+                self.assertEqual(getattr(self.test_objs[1], name), expected)
+        finally:
+            post_init.disconnect(receiver, sender=RelatedTestObj)
+
+    def test_computed_from_rows_empty(self):
+        test_obj = TestObj.objects.create()
+        field = TestObj._meta.get_field('rto_first_item')
+        self.assertIsNone(field.get_computed_value(test_obj))
+        field = TestObj._meta.get_field('rto_first_2_items')
+        self.assertEqual(field.get_computed_value(test_obj), [])
+
+
+class IncrementalAggregateTestCase(TestCase):
+    def setUp(self):
+        self.test_obj = TestObj.objects.create()
+        self.test_obj2 = TestObj.objects.create()
+        self.rto1 = RelatedTestObj.objects.create(
+            value=1, test_obj=self.test_obj)
+        self.rto2 = RelatedTestObj.objects.create(
+            value=2, test_obj=self.test_obj)
+
+    def assertValues(self, test_obj, count, total):
+        test_obj = reload_model_instance(test_obj)
+        self.assertEqual(test_obj.rto_items_inc_count, count)
+        self.assertEqual(test_obj.rto_item_values_inc_sum, total)
+
+    def test_created(self):
+        self.assertValues(self.test_obj, 2, 3)
+
+    def test_value_changed(self):
+        self.rto1.value = 10
+        self.rto1.save()
+        self.assertValues(self.test_obj, 2, 12)
+
+    def test_relation_changed(self):
+        self.rto2.test_obj = self.test_obj2
+        self.rto2.save()
+        self.assertValues(self.test_obj, 1, 1)
+        self.assertValues(self.test_obj2, 1, 2)
+
+    def test_deleted(self):
+        self.rto2.delete()
+        self.assertValues(self.test_obj, 1, 1)
+
+    def test_uses_no_aggregate_queries(self):
+        field = TestObj._meta.get_field('rto_items_inc_count')
+        with CaptureQueriesContext(connection) as ctx:
+            field.increment_value(self.test_obj, 1)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertValues(self.test_obj, 3, 3)
+
+    def test_reconciles_drifted_value(self):
+        TestObj.objects.filter(pk=self.test_obj.pk).update(
+            rto_items_inc_count=100)
+        field = TestObj._meta.get_field('rto_items_inc_count')
+        self.addCleanup(setattr, field, 'increments_count', 0)
+        field.increments_count = field.reconcile_every - 1
+        RelatedTestObj.objects.create(value=0, test_obj=self.test_obj)
+        self.assertValues(self.test_obj, 3, 3)
+
+    @override_settings(ABNORM_ASYNC=True)
+    def test_asynchronous_field_is_recomputed(self):
+        field = TestObj._meta.get_field('rto_items_inc_count')
+        with mock.patch('abnorm.fields.enqueue_update') as enqueue_update:
+            field.increment_value(self.test_obj, 1)
+        enqueue_update.assert_called_once_with(field, [self.test_obj.pk])
+        self.assertValues(self.test_obj, 2, 3)
+
+    def test_increments_counted_across_threads(self):
+        field = TestObj._meta.get_field('rto_items_inc_count')
+        self.addCleanup(setattr, field, 'increments_count', 0)
+        field.increments_count = 0
+        with mock.patch('abnorm.fields.write_values'), \
+                mock.patch.object(field, 'update_value') as update_value:
+            threads = [
+                threading.Thread(target=lambda: [
+                    field.increment_value(self.test_obj, 1)
+                    for i in range(field.reconcile_every)])
+                for i in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(field.increments_count, 4 * field.reconcile_every)
+        self.assertEqual(update_value.call_count, 4)
+
+    def test_qs_filter_is_not_supported(self):
+        with self.assertRaises(ValueError):
+            CountField('rto_items', qs_filter={'value': 1}, incremental=True)
+
+
+class IncrementalRelationTestCase(TestCase):
+    def setUp(self):
+        self.test_obj = RankedTestObj.objects.create()
+        self.items = [
+            RankedRelatedTestObj.objects.create(
+                value=value, test_obj=self.test_obj)
+            for value in (1, 5, 3)
+        ]
+
+    def assertTop(self, values):
+        test_obj = reload_model_instance(self.test_obj)
+        self.assertEqual([i.value for i in test_obj.top_2_items], values)
+        self.assertEqual(
+            test_obj.top_item and test_obj.top_item.value,
+            values[0] if values else None)
+        # in line with full recomputation
+        for name in ('top_2_items', 'top_item'):
+            field = RankedTestObj._meta.get_field(name)
+            self.assertEqual(
+                getattr(test_obj, name),
+                field.get_denormalized_value(test_obj))
+
+    def count_item_selects(self, queries):
+        table = RankedRelatedTestObj._meta.db_table
+        return len([
+            q for q in queries
+            if q['sql'].startswith('SELECT') and table in q['sql']])
+
+    def get_ordering(self, ordering):
+        field = RelationField(
+            'rto_items', fields=('id', 'value'), limit=2, incremental=True)
+        field.set_attributes_from_name('field')
+        field.model = TestObj
+        with mock.patch.object(RelatedTestObj._meta, 'ordering', ordering):
+            return [
+                (name, descending)
+                for name, f, descending in field.incremental_ordering]
+
+    def test_ordering_by_pk(self):
+        self.assertEqual(self.get_ordering(('pk',)), [('id', False)])
+        self.assertEqual(self.get_ordering(('-pk',)), [('id', True)])
+        self.assertEqual(self.get_ordering(('-id',)), [('id', True)])
+        self.assertEqual(
+            self.get_ordering(('value', '-pk')),
+            [('value', False), ('id', True)])
+        self.assertEqual(
+            self.get_ordering(('-value',)), [('value', True), ('id', False)])
+
+    def test_created(self):
+        self.assertTop([5, 3])
+        with CaptureQueriesContext(connection) as ctx:
+            RankedRelatedTestObj.objects.create(
+                value=4, test_obj=self.test_obj)
+        self.assertEqual(self.count_item_selects(ctx.captured_queries), 0)
+        self.assertTop([5, 4])
+
+    def test_change_outside_window(self):
+        item = self.items[0]
+        item.value = 2
+        with CaptureQueriesContext(connection) as ctx:
+            item.save()
+        self.assertEqual(self.count_item_selects(ctx.captured_queries), 0)
+        self.assertEqual(count_updates(ctx.captured_queries, RankedTestObj), 1)
+        self.assertTop([5, 3])
+
+    def test_move_within_window(self):
+        item = self.items[2]
+        item.value = 10
+        with CaptureQueriesContext(connection) as ctx:
+            item.save()
+        self.assertEqual(self.count_item_selects(ctx.captured_queries), 0)
+        self.assertTop([10, 5])
+
+    def test_enter_window(self):
+        item = self.items[0]
+        item.value = 4
+        item.save()
+        self.assertTop([5, 4])
+
+    def test_leave_window(self):
+        item = self.items[1]
+        item.value = 0
+        with CaptureQueriesContext(connection) as ctx:
+            item.save()
+        # refilled, both fields share the items (see `AbnormCache`)
+        self.assertEqual(self.count_item_selects(ctx.captured_queries), 1)
+        self.assertTop([3, 1])
+
+    def test_deleted(self):
+        self.items[0].delete()
+        self.assertTop([5, 3])
+        self.items[1].delete()
+        self.assertTop([3])
+        self.items[2].delete()
+        self.assertTop([])
+
+    def test_relation_changed(self):
+        other = RankedTestObj.objects.create()
+        item = self.items[1]
+        item.test_obj = other
+        item.save()
+        self.assertTop([3, 1])
+        other = reload_model_instance(other)
+        self.assertEqual([i.value for i in other.top_2_items], [5])
+
+    def test_deferred_changes(self):
+        with AbnormDeferrer():
+            for value in (7, 6, 0):
+                RankedRelatedTestObj.objects.create(
+                    value=value, test_obj=self.test_obj)
+            self.items[1].delete()
+        self.assertTop([7, 6])
+
+    def test_qs_filter_is_not_supported(self):
+        with self.assertRaises(ValueError):
+            RelationField(
+                'items', fields=('id', 'value'), limit=2, incremental=True,
+                qs_filter={'value': 1})
+
+    def test_requires_ordering_fields(self):
+        field = RelationField(
+            'items', fields=('id',), limit=1, incremental=True)
+        field.set_attributes_from_name('field')
+        field.model = RankedTestObj
+        with self.assertRaises(ValueError):
+            field.incremental_ordering
+
+
+class InPlacePatchTestCase(TestCase):
+    def setUp(self):
+        self.test_obj = RankedTestObj.objects.create()
+        self.items = [
+            RankedRelatedTestObj.objects.create(
+                value=value, name='item%d' % value, test_obj=self.test_obj)
+            for value in (1, 3, 2)
+        ]
+        self.names = ['all_items']
+        if this_django.JSONField is not None:
+            self.names.append('all_items_json')
+
+    def assertItems(self, values):
+        test_obj = reload_model_instance(self.test_obj)
+        for name in self.names:
+            value = getattr(test_obj, name)
+            self.assertEqual([(i.value, i.name) for i in value], values)
+            # in line with full recomputation
+            field = RankedTestObj._meta.get_field(name)
+            self.assertEqual(
+                [(i.value, i.name) for i in value],
+                [(i.value, i.name)
+                 for i in field.get_denormalized_value(test_obj)])
+
+    def test_patched_in_place(self):
+        item = self.items[0]
+        item.name = 'renamed'
+        table = RankedRelatedTestObj._meta.db_table
+        with CaptureQueriesContext(connection) as ctx:
+            item.save()
+        self.assertFalse([
+            q for q in ctx.captured_queries
+            if q['sql'].startswith('SELECT') and table in q['sql']])
+        self.assertItems([(3, 'item3'), (2, 'item2'), (1, 'renamed')])
+
+    @skipIf(this_django.JSONField is None, 'JSONField requires django 3.1+')
+    def test_json_patched_by_database(self):
+        item = self.items[1]
+        item.name = 'renamed'
+        with CaptureQueriesContext(connection) as ctx:
+            item.save()
+        sql = [q['sql'] for q in ctx.captured_queries]
+        # only text column value is read
+        stored_table = RankedTestObj._meta.db_table
+        self.assertEqual(len([
+            q for q in sql
+            if q.startswith('SELECT') and stored_table in q]), 1)
+        self.assertTrue(any('json_replace' in q for q in sql))
+        self.assertItems([(3, 'renamed'), (2, 'item2'), (1, 'item1')])
+
+    def test_reordered(self):
+        item = self.items[0]
+        item.value = 5
+        item.save()
+        self.assertItems([(5, 'item1'), (3, 'item3'), (2, 'item2')])
+
+    def test_created_and_deleted(self):
+        with AbnormDeferrer():
+            RankedRelatedTestObj.objects.create(
+                value=0, name='item0', test_obj=self.test_obj)
+            self.items[1].name = 'renamed'
+            self.items[1].save()
+            self.items[2].delete()
+        self.assertItems([(3, 'renamed'), (1, 'item1'), (0, 'item0')])
+
+
 class GenericRelationTestCase(TestCase):
     def setUp(self):
         self.test_obj = TestObj.objects.create()
@@ -180,6 +635,76 @@ class M2MReverseRelationTestCase(TestCase):
         self.m2mobj = reload_model_instance(self.m2mobj)
         self.assertEqual(self.m2mobj.testobj_items_count, 1)
 
+    def test_m2m_reverse_changes_update_augmented_instances(self):
+        test_obj2 = TestObj.objects.create()
+        self.m2mobj.testobj_set.add(self.test_obj, test_obj2)
+        for test_obj in (self.test_obj, test_obj2):
+            test_obj = reload_model_instance(test_obj)
+            self.assertEqual(test_obj.m2m_items_count, 1)
+            self.assertEqual(test_obj.m2m_first_item, self.m2mobj)
+
+        self.m2mobj.testobj_set.clear()
+        for test_obj in (self.test_obj, test_obj2):
+            test_obj = reload_model_instance(test_obj)
+            self.assertEqual(test_obj.m2m_items_count, 0)
+            self.assertIsNone(test_obj.m2m_first_item)
+
+
+class M2MFanOutTestCase(TestCase):
+    def setUp(self):
+        self.m2mobj = M2MTestObj.objects.create(value=1)
+        self.test_objs = [TestObj.objects.create() for i in range(5)]
+        self.m2mobj.testobj_set.add(*self.test_objs)
+        self.bulk_updates = []
+        post_bulk_update.connect(self.post_bulk_update_receiver)
+        self.addCleanup(
+            post_bulk_update.disconnect, self.post_bulk_update_receiver)
+
+    def post_bulk_update_receiver(self, sender, pks, **kwargs):
+        self.bulk_updates.append((sender, set(pks)))
+
+    def test_aggregates_updated_in_bulk(self):
+        self.m2mobj.value = 3
+        with CaptureQueriesContext(connection) as ctx:
+            self.m2mobj.save()
+
+        sums = [
+            q for q in ctx.captured_queries
+            if 'SUM("tests_m2mtestobj"."value")' in q['sql']]
+        self.assertEqual(len(sums), 1)
+        self.assertEqual(
+            self.bulk_updates,
+            [(TestObj, {test_obj.pk for test_obj in self.test_objs})])
+        for test_obj in self.test_objs:
+            test_obj = reload_model_instance(test_obj)
+            self.assertEqual(test_obj.m2m_item_values_sum, 3)
+            self.assertEqual(test_obj.m2m_first_item.value, 3)
+
+    def test_post_update_sent_for_other_receivers_only(self):
+        # abnorm receivers of TestObj `post_update` are connected
+        self.assertTrue(post_update.has_listeners(TestObj))
+        self.m2mobj.value = 3
+        with mock.patch.object(
+                post_update, 'send', wraps=post_update.send) as send:
+            self.m2mobj.save()
+        self.assertFalse([
+            call for call in send.call_args_list
+            if call[1].get('bulk')])
+
+        updates = []
+
+        def receiver(sender, instance, bulk=False, **kwargs):
+            if bulk:
+                updates.append(instance.pk)
+
+        post_update.connect(receiver, sender=TestObj)
+        self.addCleanup(post_update.disconnect, receiver, sender=TestObj)
+        self.m2mobj.value = 5
+        self.m2mobj.save()
+        self.assertEqual(
+            sorted(updates),
+            sorted(test_obj.pk for test_obj in self.test_objs))
+
 
 class PostUpdateTestCase(TestCase):
     def setUp(self):
@@ -619,3 +1144,320 @@ class IgnoredModelTestCase(TestCase):
 
     def test_nothing_has_changed_for_ignored_model(self):
         self.assertEqual(self.test_obj.m2m_item_values_sum, 0)
+
+
+class DispatchTableTestCase(TestCase):
+    def get_receivers_count(self, signal, sender):
+        return len([r for r in signal.receivers if r[0][1] == id(sender)])
+
+    def test_single_receiver_per_signal(self):
+        for signal in (pre_save, post_save, post_delete):
+            self.assertEqual(
+                self.get_receivers_count(signal, RelatedTestObj), 1)
+        # original values are kept by `from_db` instead
+        self.assertEqual(
+            self.get_receivers_count(post_init, RelatedTestObj), 0)
+
+    def test_snapshot_taken_on_load(self):
+        test_obj = TestObj.objects.create()
+        RelatedTestObj.objects.create(test_obj=test_obj, value=1)
+        self.assertFalse(hasattr(RelatedTestObj(), '_abnorm_snapshot'))
+        rto = RelatedTestObj.objects.get()
+        self.assertEqual(rto._abnorm_snapshot['test_obj_id'], test_obj.pk)
+        self.assertEqual(rto._abnorm_snapshot['value'], 1)
+        # handlers of all the fields watching the model
+        self.assertGreater(
+            len(state.dispatch_table[(post_save, RelatedTestObj)]), 10)
+
+    def test_snapshot_taken_on_refresh(self):
+        test_obj = TestObj.objects.create()
+        rto = RelatedTestObj.objects.create(test_obj=test_obj, value=1)
+        RelatedTestObj.objects.create(test_obj=test_obj, value=2)
+        RelatedTestObj.objects.filter(pk=rto.pk).update(value=7)
+        rto.refresh_from_db()
+        self.assertEqual(rto._abnorm_snapshot['value'], 7)
+        rto.value = 1
+        rto.save()
+        test_obj = reload_model_instance(test_obj)
+        self.assertEqual(test_obj.rto_item_values_sum, 3)
+        self.assertEqual(test_obj.rto_item_values_inc_sum, 3)
+        self.assertEqual(test_obj.rto_first_2_items[0].value, 1)
+
+    def test_snapshot_taken_after_write(self):
+        test_obj = TestObj.objects.create()
+        rto = RelatedTestObj.objects.create(test_obj=test_obj, value=1)
+        rto.value = 2
+        with mock.patch.object(
+                RelatedTestObj, '_do_update', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                rto.save()
+        self.assertEqual(rto._abnorm_snapshot['value'], 1)
+        rto.save(update_fields=['test_obj'])
+        self.assertEqual(rto._abnorm_snapshot['value'], 1)
+        rto.save()
+        self.assertEqual(rto._abnorm_snapshot['value'], 2)
+        test_obj = reload_model_instance(test_obj)
+        self.assertEqual(test_obj.rto_item_values_sum, 2)
+
+    def test_changes_unfiltered_wo_reliable_snapshot(self):
+        test_obj = TestObj.objects.create()
+        rto = RelatedTestObj.objects.create(test_obj=test_obj, value=1)
+        field = TestObj._meta.get_field('rto_item_values_sum')
+        rto.save()
+        self.assertFalse(field.is_changed(rto))
+        with mock.patch.object(
+                RelatedTestObj, '_do_update', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                rto.save()
+        rto.save()
+        self.assertTrue(field.is_changed(rto))
+        rto.save()
+        self.assertFalse(field.is_changed(rto))
+        rto = RelatedTestObj(pk=rto.pk, test_obj=test_obj, value=1)
+        rto.save()
+        self.assertTrue(field.is_changed(rto))
+
+
+class CoalescedUpdateTestCase(TestCase):
+    def setUp(self):
+        self.test_obj = TestObj.objects.create()
+        self.post_updates = []
+        post_update.connect(self.post_update_receiver, sender=TestObj)
+        self.addCleanup(
+            post_update.disconnect, self.post_update_receiver, sender=TestObj)
+
+    def post_update_receiver(self, sender, instance, **kwargs):
+        self.post_updates.append(instance.pk)
+
+    def test_relation_fields_updated_at_once(self):
+        with CaptureQueriesContext(connection) as ctx:
+            rto = RelatedTestObj.objects.create(
+                value=1, test_obj=self.test_obj)
+
+        self.assertEqual(count_updates(ctx.captured_queries, TestObj), 1)
+        self.assertEqual(self.post_updates, [self.test_obj.pk])
+
+        self.test_obj = reload_model_instance(self.test_obj)
+        self.assertEqual(self.test_obj.rto_items_count, 1)
+        self.assertEqual(self.test_obj.rto_items_qsf_count, 1)
+        self.assertEqual(self.test_obj.rto_items_inc_count, 1)
+        self.assertEqual(self.test_obj.rto_item_values_sum, 1)
+        self.assertEqual(self.test_obj.rto_first_item, rto)
+        self.assertEqual(self.test_obj.rto_first_2_items, [rto])
+
+    def test_relation_aggregates_computed_at_once(self):
+        with CaptureQueriesContext(connection) as ctx:
+            RelatedTestObj.objects.create(value=1, test_obj=self.test_obj)
+            RelatedTestObj.objects.create(value=2, test_obj=self.test_obj)
+
+        aggregates = [
+            q for q in ctx.captured_queries
+            if 'FROM "tests_relatedtestobj"' in q['sql'] and (
+                'COUNT(' in q['sql'] or 'SUM(' in q['sql'])
+        ]
+        self.assertEqual(len(aggregates), 2)
+
+        self.test_obj = reload_model_instance(self.test_obj)
+        self.assertEqual(self.test_obj.rto_items_count, 2)
+        self.assertEqual(self.test_obj.rto_items_qsf_count, 1)
+        self.assertEqual(self.test_obj.rto_items_qsfq_count, 1)
+        self.assertEqual(self.test_obj.rto_item_values_sum, 3)
+
+        # augmented model values are computed the same way on save
+        TestObj.objects.filter(pk=self.test_obj.pk).update(
+            rto_items_count=0, rto_item_values_sum=0)
+        self.test_obj.save()
+        self.test_obj = reload_model_instance(self.test_obj)
+        self.assertEqual(self.test_obj.rto_items_count, 2)
+        self.assertEqual(self.test_obj.rto_item_values_sum, 3)
+
+    def test_m2m_relation_fields_updated_at_once(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.test_obj.m2m_items.add(M2MTestObj.objects.create(value=3))
+
+        self.assertEqual(count_updates(ctx.captured_queries, TestObj), 1)
+        self.test_obj = reload_model_instance(self.test_obj)
+        self.assertEqual(self.test_obj.m2m_items_count, 1)
+        self.assertEqual(self.test_obj.m2m_item_values_sum, 3)
+
+
+class DeferredUpdateTestCase(TestCase):
+    def setUp(self):
+        self.test_obj = TestObj.objects.create()
+
+    def test_updates_deferred_until_exit(self):
+        with AbnormDeferrer():
+            RelatedTestObj.objects.create(value=1, test_obj=self.test_obj)
+            RelatedTestObj.objects.create(value=2, test_obj=self.test_obj)
+            self.test_obj = reload_model_instance(self.test_obj)
+            self.assertEqual(self.test_obj.rto_items_count, 0)
+
+        self.test_obj = reload_model_instance(self.test_obj)
+        self.assertEqual(self.test_obj.rto_items_count, 2)
+        self.assertEqual(self.test_obj.rto_item_values_sum, 3)
+        self.assertEqual(self.test_obj.rto_first_item.value, 1)
+
+    def test_each_field_updated_once(self):
+        with CaptureQueriesContext(connection) as single:
+            RelatedTestObj.objects.create(value=1, test_obj=self.test_obj)
+
+        with CaptureQueriesContext(connection) as deferred:
+            with AbnormDeferrer():
+                for value in range(5):
+                    RelatedTestObj.objects.create(
+                        value=value, test_obj=self.test_obj)
+
+        single_count = count_updates(single.captured_queries, TestObj)
+        self.assertGreater(single_count, 0)
+        self.assertEqual(
+            count_updates(deferred.captured_queries, TestObj), single_count)
+
+    def test_cascade_is_deferred_too(self):
+        parent = TestParentObj.objects.create()
+        with AbnormDeferrer():
+            self.test_obj.parent = parent
+            self.test_obj.save()
+            self.test_obj.m2m_items.add(M2MTestObj.objects.create(value=7))
+
+        parent = reload_model_instance(parent)
+        self.assertEqual(
+            parent.all_test_objs[0].m2m_first_2_items[0].value, 7)
+
+    @override_settings(ABNORM_DEFER_UNTIL_COMMIT=True)
+    def test_updates_deferred_until_commit(self):
+        if not hasattr(self, 'captureOnCommitCallbacks'):
+            self.skipTest('django 3.2+ is required')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RelatedTestObj.objects.create(value=1, test_obj=self.test_obj)
+            RelatedTestObj.objects.create(value=2, test_obj=self.test_obj)
+            self.test_obj = reload_model_instance(self.test_obj)
+            self.assertEqual(self.test_obj.rto_items_count, 0)
+
+        self.test_obj = reload_model_instance(self.test_obj)
+        self.assertEqual(self.test_obj.rto_items_count, 2)
+
+    @override_settings(ABNORM_DEFER_UNTIL_COMMIT=True)
+    def test_rolled_back_updates_discarded(self):
+        if not hasattr(self, 'captureOnCommitCallbacks'):
+            self.skipTest('django 3.2+ is required')
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    RelatedTestObj.objects.create(
+                        value=1, test_obj=self.test_obj)
+                    raise ValueError
+            except ValueError:
+                pass
+            RelatedTestObj.objects.create(value=2, test_obj=self.test_obj)
+            RelatedTestObj.objects.create(value=3, test_obj=self.test_obj)
+
+        # a single callback per transaction
+        self.assertEqual(len(callbacks), 1)
+        self.test_obj = reload_model_instance(self.test_obj)
+        self.assertEqual(self.test_obj.rto_items_inc_count, 2)
+        self.assertEqual(self.test_obj.rto_item_values_inc_sum, 5)
+        self.assertFalse(state._local.commit_queues)
+
+
+class AbnormCacheTestCase(TestCase):
+    def setUp(self):
+        self.test_obj = TestObj.objects.create()
+        RelatedTestObj.objects.create(test_obj=self.test_obj, value=1)
+        RelatedTestObj.objects.create(test_obj=self.test_obj, value=2)
+        self.fields = [
+            TestObj._meta.get_field(name) for name in (
+                'rto_first_item', 'rto_first_2_items',
+                'rto_first_2_items_binary', 'rto_items_count')
+        ]
+
+    def count_selects(self, fields):
+        table = RelatedTestObj._meta.db_table
+        with CaptureQueriesContext(connection) as ctx:
+            values = get_denormalized_values(self.test_obj, fields)
+        return values, len([
+            q for q in ctx.captured_queries
+            if q['sql'].startswith('SELECT') and table in q['sql']])
+
+    def test_related_items_shared(self):
+        values, count = self.count_selects(self.fields)
+        self.assertEqual(count, 4)
+        with AbnormCache():
+            cached_values, count = self.count_selects(self.fields)
+            self.assertEqual(count, 2)
+            # computed already
+            self.assertEqual(self.count_selects(self.fields)[1], 0)
+        self.assertEqual(cached_values, values)
+        self.assertEqual(self.count_selects(self.fields)[1], 4)
+
+    def test_invalidated_by_writes(self):
+        field = TestObj._meta.get_field('rto_first_2_items')
+        with AbnormCache():
+            self.assertEqual(len(field.get_cached_value(self.test_obj)), 2)
+            RelatedTestObj.objects.filter(value=2).delete()
+            self.assertEqual(len(field.get_cached_value(self.test_obj)), 1)
+            # writes to other models keep the value
+            M2MTestObj.objects.create()
+            self.assertEqual(self.count_selects([field])[1], 0)
+
+    def test_not_used_by_deferrer_block(self):
+        nrto = NullRelatedTestObj.objects.create()
+        with AbnormDeferrer():
+            self.test_obj.save()
+            # bypasses abnorm
+            NullRelatedTestObj.objects.filter(pk=nrto.pk).update(
+                test_obj=self.test_obj)
+            self.test_obj.save()
+        self.test_obj = reload_model_instance(self.test_obj)
+        self.assertEqual(self.test_obj.nrto_items_count, 1)
+
+
+class CascadeTestCase(TestCase):
+    def setUp(self):
+        self.grand_parent = TestParentObj.objects.create()
+        self.parent = TestParentObj.objects.create(parent=self.grand_parent)
+        self.test_obj = TestObj.objects.create(parent=self.parent)
+
+    def test_ranks(self):
+        self.assertLess(
+            state.get_cascade_rank(RelatedTestObj),
+            state.get_cascade_rank(TestObj))
+        self.assertLess(
+            state.get_cascade_rank(TestObj),
+            state.get_cascade_rank(TestParentObj))
+
+    def test_each_instance_updated_once(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.test_obj.m2m_items.add(M2MTestObj.objects.create(value=7))
+
+        self.assertEqual(count_updates(ctx.captured_queries, TestObj), 1)
+        self.assertEqual(
+            count_updates(ctx.captured_queries, TestParentObj), 2)
+        grand_parent = reload_model_instance(self.grand_parent)
+        self.assertEqual(
+            grand_parent.all_children[0].all_test_objs[0]
+            .m2m_first_2_items[0].value, 7)
+
+    @override_settings(ABNORM_MAX_CASCADE_DEPTH=1)
+    def test_max_depth(self):
+        with self.assertLogs('abnorm', 'WARNING'):
+            self.test_obj.m2m_items.add(M2MTestObj.objects.create(value=7))
+
+        parent = reload_model_instance(self.parent)
+        self.assertEqual(
+            parent.all_test_objs[0].m2m_first_2_items[0].value, 7)
+        grand_parent = reload_model_instance(self.grand_parent)
+        self.assertEqual(
+            grand_parent.all_children[0].all_test_objs[0]
+            .m2m_first_2_items, [])
+
+    def test_cycle(self):
+        TestParentObj.objects.filter(pk=self.grand_parent.pk).update(
+            parent=self.parent)
+        with self.assertLogs('abnorm', 'WARNING'):
+            TestObj.objects.create(
+                parent=reload_model_instance(self.parent))
+
+        parent = reload_model_instance(self.parent)
+        self.assertEqual(len(parent.all_test_objs), 2)
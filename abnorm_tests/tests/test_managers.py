@@ -0,0 +1,176 @@
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .models import (
+    TestObj, RelatedTestObj, GenericRelatedTestObj, M2MTestObj,
+)
+
+from abnorm import AbnormDeferrer
+from abnorm.utils import reload_model_instance
+
+
+class AbnormManagerTestCase(TestCase):
+    def setUp(self):
+        self.test_obj = TestObj.objects.create()
+        self.test_obj2 = TestObj.objects.create()
+
+    def reload(self):
+        self.test_obj = reload_model_instance(self.test_obj)
+        self.test_obj2 = reload_model_instance(self.test_obj2)
+
+    def test_bulk_create(self):
+        RelatedTestObj.objects.bulk_create([
+            RelatedTestObj(test_obj=self.test_obj, value=value)
+            for value in (1, 2, 4)
+        ] + [RelatedTestObj(test_obj=self.test_obj2, value=8)])
+
+        self.reload()
+        self.assertEqual(self.test_obj.rto_items_count, 3)
+        self.assertEqual(self.test_obj.rto_item_values_sum, 7)
+        self.assertEqual(self.test_obj.rto_first_item.value, 1)
+        self.assertEqual(self.test_obj2.rto_items_count, 1)
+        self.assertEqual(self.test_obj2.rto_item_values_sum, 8)
+
+    def test_bulk_create_generic_relation(self):
+        GenericRelatedTestObj.objects.bulk_create([
+            GenericRelatedTestObj(content_object=self.test_obj, value=value)
+            for value in (1, 2)
+        ])
+        self.reload()
+        self.assertEqual(self.test_obj.grto_items_count, 2)
+        self.assertEqual(self.test_obj.grto_item_values_sum, 3)
+
+    def test_bulk_create_is_set_based(self):
+        objs = [
+            RelatedTestObj(test_obj=self.test_obj, value=value)
+            for value in range(10)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            RelatedTestObj.objects.bulk_create(objs)
+        aggregates = [
+            q for q in ctx.captured_queries
+            if 'GROUP BY' in q['sql'] and 'COUNT(' in q['sql']]
+        self.assertEqual(len(aggregates), 1)
+
+    def test_update(self):
+        rto = RelatedTestObj.objects.create(test_obj=self.test_obj, value=1)
+        RelatedTestObj.objects.create(test_obj=self.test_obj, value=2)
+
+        RelatedTestObj.objects.update(value=5)
+        self.reload()
+        self.assertEqual(self.test_obj.rto_item_values_sum, 10)
+        self.assertEqual(self.test_obj.rto_first_item.value, 5)
+
+        # both previous and new related instances are updated
+        RelatedTestObj.objects.filter(pk=rto.pk).update(
+            test_obj=self.test_obj2)
+        self.reload()
+        self.assertEqual(self.test_obj.rto_items_count, 1)
+        self.assertEqual(self.test_obj2.rto_items_count, 1)
+        self.assertEqual(self.test_obj2.rto_item_values_sum, 5)
+
+    def test_update_skips_unrelated_columns(self):
+        m2m = M2MTestObj.objects.create(value=1)
+        self.test_obj.m2m_items.add(m2m)
+        with CaptureQueriesContext(connection) as ctx:
+            M2MTestObj.objects.update(testobj_items_count=0)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    @override_settings(ABNORM_ASYNC=True)
+    def test_update_asynchronous_fields(self):
+        RelatedTestObj.objects.create(test_obj=self.test_obj, value=1)
+        with mock.patch('abnorm.fields.enqueue_update') as enqueue_update:
+            RelatedTestObj.objects.update(value=5)
+        fields = {call[0][0].name for call in enqueue_update.call_args_list}
+        self.assertIn('rto_item_values_sum', fields)
+        self.reload()
+        self.assertEqual(self.test_obj.rto_item_values_sum, 0)
+
+    def test_update_m2m_relation(self):
+        m2m = M2MTestObj.objects.create(value=1)
+        self.test_obj.m2m_items.add(m2m)
+
+        M2MTestObj.objects.update(value=3)
+        self.reload()
+        self.assertEqual(self.test_obj.m2m_item_values_sum, 3)
+        self.assertEqual(self.test_obj.m2m_first_item.value, 3)
+
+    def test_bulk_update(self):
+        rtos = [
+            RelatedTestObj.objects.create(test_obj=self.test_obj, value=1)
+            for i in range(3)
+        ]
+        for rto in rtos:
+            rto.value = 2
+        rtos[0].test_obj = self.test_obj2
+        RelatedTestObj.objects.bulk_update(rtos, ['value', 'test_obj'])
+
+        self.reload()
+        self.assertEqual(self.test_obj.rto_item_values_sum, 4)
+        self.assertEqual(self.test_obj2.rto_item_values_sum, 2)
+
+    def test_delete(self):
+        for value in (1, 2, 3):
+            RelatedTestObj.objects.create(test_obj=self.test_obj, value=value)
+
+        with CaptureQueriesContext(connection) as ctx:
+            RelatedTestObj.objects.filter(value__gt=1).delete()
+        updates = [
+            q for q in ctx.captured_queries
+            if q['sql'].startswith('UPDATE "tests_testobj"')]
+        self.assertEqual(len(updates), 1)
+
+        self.reload()
+        self.assertEqual(self.test_obj.rto_items_count, 1)
+        self.assertEqual(self.test_obj.rto_item_values_sum, 1)
+
+
+class DeferredBulkUpdateTestCase(TestCase):
+    def setUp(self):
+        self.test_obj = TestObj.objects.create()
+
+    def assertIncrementalValues(self, count, total):
+        test_obj = reload_model_instance(self.test_obj)
+        self.assertEqual(test_obj.rto_items_inc_count, count)
+        self.assertEqual(test_obj.rto_item_values_inc_sum, total)
+
+    def bulk_create(self, *values):
+        RelatedTestObj.objects.bulk_create([
+            RelatedTestObj(test_obj=self.test_obj, value=value)
+            for value in values
+        ])
+
+    def test_signal_write_then_bulk_create(self):
+        with AbnormDeferrer():
+            RelatedTestObj.objects.create(test_obj=self.test_obj, value=1)
+            self.bulk_create(2)
+        self.assertIncrementalValues(2, 3)
+
+    def test_bulk_create_then_signal_write(self):
+        with AbnormDeferrer():
+            self.bulk_create(2)
+            RelatedTestObj.objects.create(test_obj=self.test_obj, value=1)
+        self.assertIncrementalValues(2, 3)
+
+    def test_delete_then_update(self):
+        for value in (1, 2):
+            RelatedTestObj.objects.create(test_obj=self.test_obj, value=value)
+        with AbnormDeferrer():
+            RelatedTestObj.objects.get(value=1).delete()
+            RelatedTestObj.objects.update(value=5)
+        self.assertIncrementalValues(1, 5)
+
+    @override_settings(ABNORM_DEFER_UNTIL_COMMIT=True)
+    def test_deferred_until_commit(self):
+        if not hasattr(self, 'captureOnCommitCallbacks'):
+            self.skipTest('django 3.2+ is required')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                RelatedTestObj.objects.create(
+                    test_obj=self.test_obj, value=1)
+                self.bulk_create(2)
+        self.assertIncrementalValues(2, 3)
@@ -0,0 +1,157 @@
+import datetime
+import uuid
+from decimal import Decimal
+from unittest import skipIf
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from django.test import TestCase, override_settings
+
+from .models import TestObj, RelatedTestObj
+
+from abnorm import RelationField
+from abnorm.adapters import this_django
+from abnorm.serializers import get_serializer
+from abnorm.utils import reload_model_instance
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class SerializerRoundTripMixin(object):
+    serializer_name = None
+    microsecond = 123456
+
+    def test_round_trip(self):
+        serializer = get_serializer(self.serializer_name)
+        fields = {
+            'decimal': (models.DecimalField(
+                max_digits=10, decimal_places=3), Decimal('1.250')),
+            'datetime': (
+                models.DateTimeField(),
+                datetime.datetime(2020, 1, 2, 3, 4, 5, self.microsecond)),
+            'time': (
+                models.TimeField(), datetime.time(3, 4, 5, self.microsecond)),
+            'date': (models.DateField(), datetime.date(2020, 1, 2)),
+            'uuid': (models.UUIDField(), uuid.uuid4()),
+            'file': (models.FileField(), 'dir/file.txt'),
+            'int': (models.IntegerField(), 5),
+            'none': (models.IntegerField(null=True), None),
+        }
+        data = serializer.loads(serializer.dumps(
+            [{k: v for k, (f, v) in fields.items()}]))
+        for name, (field, value) in fields.items():
+            self.assertEqual(field.to_python(data[0][name]), value)
+
+
+class JSONSerializerTestCase(SerializerRoundTripMixin, TestCase):
+    serializer_name = 'json'
+    # DjangoJSONEncoder (the legacy format) keeps milliseconds only
+    microsecond = 123000
+
+
+@skipIf(orjson is None, 'orjson is not installed')
+class OrjsonSerializerTestCase(SerializerRoundTripMixin, TestCase):
+    serializer_name = 'orjson'
+
+
+@skipIf(msgpack is None, 'msgpack is not installed')
+class MsgpackSerializerTestCase(SerializerRoundTripMixin, TestCase):
+    serializer_name = 'msgpack'
+
+    def test_requires_binary_field(self):
+        field = RelationField(
+            'rto_items', fields=('id',), serializer='msgpack')
+        field.set_attributes_from_name('field')
+        field.model = TestObj
+        with self.assertRaises(ImproperlyConfigured):
+            field.serializer
+
+
+class BinaryRelationFieldTestCase(TestCase):
+    def setUp(self):
+        self.test_obj = TestObj.objects.create()
+        self.rto1 = RelatedTestObj.objects.create(
+            test_obj=self.test_obj, value=1)
+        self.rto2 = RelatedTestObj.objects.create(
+            test_obj=self.test_obj, value=2)
+        self.test_obj = reload_model_instance(self.test_obj)
+
+    def test_stores_bytes(self):
+        raw = self.test_obj.__dict__['rto_first_2_items_binary'].raw
+        self.assertIsInstance(raw, bytes)
+
+    def test_value(self):
+        self.assertEqual(
+            self.test_obj.rto_first_2_items_binary, [self.rto1, self.rto2])
+        self.assertEqual(
+            [i.value for i in self.test_obj.rto_first_2_items_binary], [1, 2])
+
+    def test_empty_value(self):
+        RelatedTestObj.objects.all().delete()
+        self.test_obj = reload_model_instance(self.test_obj)
+        self.assertEqual(self.test_obj.rto_first_2_items_binary, [])
+
+
+@override_settings(ABNORM_SERIALIZER='unknown.Serializer')
+class SerializerSettingTestCase(TestCase):
+    def test_unknown_serializer(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_serializer()
+
+
+@skipIf(this_django.JSONField is None, 'JSONField requires django 3.1+')
+class JSONRelationFieldTestCase(TestCase):
+    def setUp(self):
+        self.test_obj = TestObj.objects.create()
+        self.other_test_obj = TestObj.objects.create()
+        self.rto1 = RelatedTestObj.objects.create(
+            test_obj=self.test_obj, value=1)
+        self.rto2 = RelatedTestObj.objects.create(
+            test_obj=self.test_obj, value=2)
+        RelatedTestObj.objects.create(test_obj=self.other_test_obj, value=3)
+        self.test_obj = reload_model_instance(self.test_obj)
+
+    def test_value(self):
+        self.assertEqual(self.test_obj.rto_first_item_json, self.rto1)
+        self.assertEqual(self.test_obj.rto_first_item_json.value, 1)
+        self.assertEqual(
+            self.test_obj.rto_first_2_items_json, [self.rto1, self.rto2])
+
+    def test_filter_by_contents(self):
+        self.assertEqual(
+            list(TestObj.objects.filter(rto_first_item_json__value=1)),
+            [self.test_obj])
+        self.assertEqual(
+            list(TestObj.objects.filter(rto_first_2_items_json__1__value=2)),
+            [self.test_obj])
+        self.assertEqual(
+            list(TestObj.objects.filter(
+                rto_first_item_json__test_obj_id=self.other_test_obj.pk)),
+            [self.other_test_obj])
+
+    def test_values_of_key(self):
+        self.assertEqual(
+            list(TestObj.objects.order_by('pk').values_list(
+                'rto_first_item_json__value', flat=True)),
+            [1, 3])
+
+    def test_serialize_value_contract(self):
+        field = TestObj._meta.get_field('rto_first_2_items_json')
+        raw = field.serialize_value([self.rto1, self.rto2])
+        self.assertIsInstance(raw, str)
+        self.assertEqual(
+            field.deserialize_value(raw), [self.rto1, self.rto2])
+
+    def test_empty_value(self):
+        RelatedTestObj.objects.filter(test_obj=self.test_obj).delete()
+        self.test_obj = reload_model_instance(self.test_obj)
+        self.assertIsNone(self.test_obj.rto_first_item_json)
+        self.assertEqual(self.test_obj.rto_first_2_items_json, [])
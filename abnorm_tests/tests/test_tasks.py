@@ -0,0 +1,120 @@
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from .models import TestObj, RelatedTestObj
+
+from abnorm import CountField, bulk
+from abnorm.models import UpdateJob
+from abnorm.tasks import ThreadPoolBackend, get_backend
+from abnorm.utils import reload_model_instance
+
+
+@override_settings(ABNORM_ASYNC=True, ABNORM_ASYNC_BACKEND='database')
+class DatabaseBackendTestCase(TestCase):
+    def setUp(self):
+        if not hasattr(self, 'captureOnCommitCallbacks'):
+            self.skipTest('django 3.2+ is required')
+        self.test_obj = TestObj.objects.create()
+
+    def test_jobs_performed_by_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RelatedTestObj.objects.create(value=1, test_obj=self.test_obj)
+            RelatedTestObj.objects.create(value=2, test_obj=self.test_obj)
+
+        self.test_obj = reload_model_instance(self.test_obj)
+        self.assertEqual(self.test_obj.rto_items_count, 0)
+        self.assertEqual(self.test_obj.rto_first_item, None)
+        # jobs are coalesced
+        job = UpdateJob.objects.get()
+        self.assertEqual(job.model, 'tests.TestObj')
+        self.assertEqual(job.object_pk, str(self.test_obj.pk))
+        self.assertIn('rto_items_count', job.fields.split(','))
+        self.assertIn('rto_first_item', job.fields.split(','))
+
+        call_command('abnorm_worker', once=True)
+        self.assertFalse(UpdateJob.objects.exists())
+        self.test_obj = reload_model_instance(self.test_obj)
+        self.assertEqual(self.test_obj.rto_items_count, 2)
+        self.assertEqual(self.test_obj.rto_item_values_sum, 3)
+        self.assertEqual(self.test_obj.rto_first_item.value, 1)
+
+    def test_enqueue_merges_fields(self):
+        backend = get_backend()
+        backend.enqueue([('tests.TestObj', self.test_obj.pk, ('a',))])
+        backend.enqueue([('tests.TestObj', self.test_obj.pk, ('b',))])
+        self.assertEqual(UpdateJob.objects.get().fields, 'a,b')
+
+    def test_enqueue_merges_concurrent_jobs(self):
+        backend = get_backend()
+        UpdateJob.objects.create(
+            model='tests.TestObj', object_pk=str(self.test_obj.pk),
+            fields='a')
+        merge_jobs = backend.merge_jobs
+        calls = []
+
+        def racing_merge_jobs(model_name, pending):
+            # the job is inserted concurrently, after the first pass
+            calls.append(model_name)
+            if len(calls) == 1:
+                return set(pending)
+            return merge_jobs(model_name, pending)
+
+        with mock.patch.object(backend, 'merge_jobs', racing_merge_jobs):
+            backend.enqueue([('tests.TestObj', self.test_obj.pk, ('b',))])
+        self.assertEqual(UpdateJob.objects.get().fields, 'a,b')
+
+    @override_settings(ABNORM_ASYNC_MAX_ATTEMPTS=2)
+    def test_failing_job(self):
+        other_obj = TestObj.objects.create()
+        RelatedTestObj.objects.create(value=1, test_obj=self.test_obj)
+        RelatedTestObj.objects.create(value=1, test_obj=other_obj)
+        backend = get_backend()
+        backend.enqueue([
+            ('tests.TestObj', pk, ('rto_items_count',))
+            for pk in (self.test_obj.pk, other_obj.pk)])
+        update_values = bulk.update_values
+
+        def failing_update_values(model, fields, pks):
+            if self.test_obj.pk in pks:
+                raise ValueError('poison')
+            return update_values(model, fields, pks)
+
+        with mock.patch.object(bulk, 'update_values', failing_update_values):
+            with self.assertLogs('abnorm', 'WARNING'):
+                self.assertEqual(backend.process(), 2)
+            job = UpdateJob.objects.get()
+            self.assertEqual(job.object_pk, str(self.test_obj.pk))
+            self.assertEqual(job.attempts, 1)
+            self.assertEqual(job.error, 'ValueError: poison')
+            other_obj = reload_model_instance(other_obj)
+            self.assertEqual(other_obj.rto_items_count, 1)
+
+            with self.assertLogs('abnorm', 'ERROR'):
+                self.assertEqual(backend.process(), 1)
+            self.assertFalse(UpdateJob.objects.exists())
+
+    def test_field_option(self):
+        self.assertTrue(CountField('rto_items').is_asynchronous)
+        self.assertFalse(
+            CountField('rto_items', asynchronous=False).is_asynchronous)
+
+
+class ThreadPoolBackendTestCase(TransactionTestCase):
+    def test_jobs_performed(self):
+        test_obj = TestObj.objects.create()
+        RelatedTestObj._base_manager.bulk_create([
+            RelatedTestObj(value=1, test_obj=test_obj),
+            RelatedTestObj(value=2, test_obj=test_obj),
+        ])
+        backend = ThreadPoolBackend()
+        backend.enqueue([
+            ('tests.TestObj', test_obj.pk, ('rto_items_count',)),
+            ('tests.TestObj', test_obj.pk, ('rto_first_item',)),
+        ])
+        backend.wait()
+
+        test_obj = reload_model_instance(test_obj)
+        self.assertEqual(test_obj.rto_items_count, 2)
+        self.assertEqual(test_obj.rto_first_item.value, 1)
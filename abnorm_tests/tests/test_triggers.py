@@ -0,0 +1,112 @@
+from unittest import skipIf
+
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.db.models import Q
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .models import TestObj, RelatedTestObj
+
+from abnorm.triggers import (
+    CreateTriggers, get_foreign_key, get_update_columns)
+from abnorm.utils import reload_model_instance
+
+
+def get_trigger_values(test_obj):
+    test_obj = reload_model_instance(test_obj)
+    return (
+        test_obj.rto_items_trigger_count,
+        test_obj.rto_items_qsf_trigger_count,
+        test_obj.rto_item_values_trigger_sum,
+    )
+
+
+@skipIf(connection.vendor != 'sqlite', 'sqlite triggers are tested only')
+class TriggersTestCase(TestCase):
+    def setUp(self):
+        self.test_obj = TestObj.objects.create()
+        self.test_obj2 = TestObj.objects.create()
+
+    def test_save_and_delete(self):
+        rto = RelatedTestObj.objects.create(test_obj=self.test_obj, value=1)
+        self.assertEqual(get_trigger_values(self.test_obj), (1, 1, 1))
+
+        rto.value = 5
+        rto.save()
+        self.assertEqual(get_trigger_values(self.test_obj), (1, 0, 5))
+
+        rto.delete()
+        self.assertEqual(get_trigger_values(self.test_obj), (0, 0, 0))
+
+    def test_bulk_create(self):
+        RelatedTestObj.objects.bulk_create([
+            RelatedTestObj(test_obj=self.test_obj, value=value)
+            for value in (1, 1, 2)
+        ])
+        self.assertEqual(get_trigger_values(self.test_obj), (3, 2, 4))
+
+    def test_queryset_update_and_delete(self):
+        RelatedTestObj.objects.create(test_obj=self.test_obj, value=1)
+        RelatedTestObj.objects.create(test_obj=self.test_obj, value=2)
+
+        RelatedTestObj.objects.update(value=3)
+        self.assertEqual(get_trigger_values(self.test_obj), (2, 0, 6))
+
+        RelatedTestObj.objects.update(test_obj=self.test_obj2)
+        self.assertEqual(get_trigger_values(self.test_obj), (0, 0, 0))
+        self.assertEqual(get_trigger_values(self.test_obj2), (2, 0, 6))
+
+        RelatedTestObj.objects.all().delete()
+        self.assertEqual(get_trigger_values(self.test_obj2), (0, 0, 0))
+
+    def test_raw_sql(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO tests_relatedtestobj (test_obj_id, value) '
+                'VALUES (%s, 7)', [self.test_obj.pk])
+        self.assertEqual(get_trigger_values(self.test_obj), (1, 0, 7))
+
+    def test_augmented_instance_save(self):
+        RelatedTestObj.objects.create(test_obj=self.test_obj, value=1)
+        # stale values are not written back
+        self.test_obj.save()
+        self.assertEqual(get_trigger_values(self.test_obj), (1, 1, 1))
+        self.test_obj.save(update_fields=['rto_items_trigger_count'])
+        self.assertEqual(get_trigger_values(self.test_obj), (1, 1, 1))
+
+    def test_no_signal_handlers(self):
+        with CaptureQueriesContext(connection) as ctx:
+            RelatedTestObj.objects.create(test_obj=self.test_obj, value=1)
+        for query in ctx.captured_queries:
+            self.assertNotIn('"rto_items_trigger_count" =', query['sql'])
+
+
+class TriggersSQLTestCase(TestCase):
+    def test_update_columns(self):
+        fk = RelatedTestObj._meta.get_field('test_obj')
+        self.assertEqual(
+            get_update_columns(
+                TestObj._meta.get_field('rto_items_trigger_count'), fk),
+            ['test_obj_id'])
+        self.assertEqual(
+            get_update_columns(
+                TestObj._meta.get_field('rto_items_qsf_trigger_count'), fk),
+            ['test_obj_id', 'value'])
+
+    def test_unsupported_relation(self):
+        with self.assertRaises(ValueError):
+            get_foreign_key(TestObj._meta.get_field('m2m_items_count'))
+        with self.assertRaises(ValueError):
+            get_foreign_key(TestObj._meta.get_field('grto_items_count'))
+
+    def test_field_from_migration_state(self):
+        field = TestObj._meta.get_field('rto_items_qsf_trigger_count')
+        self.assertEqual(field.deconstruct()[3]['qs_filter'], Q(value=1))
+
+        state = MigrationLoader(connection).project_state(
+            ('tests', '0005_trigger_fields'))
+        operation = CreateTriggers('testobj', 'rto_items_qsf_trigger_count')
+        field = operation.get_field('tests', state)
+        self.assertIsNot(field.model, TestObj)
+        self.assertEqual(field.filter, Q(value=1))
@@ -0,0 +1,77 @@
+"""
+Compares RelationField serializers encode/decode time and serialized size:
+
+    python benchmarks/serializers.py [--items 100] [--number 1000]
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import timeit
+import uuid
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.core.serializers.json import DjangoJSONEncoder  # noqa
+
+from abnorm.serializers import SERIALIZERS, get_serializer  # noqa
+
+
+class LegacySerializer(object):
+    # encoder used to be created per call
+    def dumps(self, value):
+        return DjangoJSONEncoder().encode(value)
+
+    def loads(self, data):
+        return json.loads(data, parse_float=Decimal)
+
+
+def get_items(count):
+    now = datetime.datetime(2020, 1, 1, 12, 30)
+    return [
+        {
+            'id': i,
+            'title': 'Item title #%s' % i,
+            'price': Decimal('%s.99' % i),
+            'rating': i / 7.0,
+            'is_active': bool(i % 2),
+            'created': now + datetime.timedelta(minutes=i),
+            'uuid': uuid.UUID(int=i),
+            'image': 'images/%s.jpg' % i,
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=100)
+    parser.add_argument('--number', type=int, default=1000)
+    options = parser.parse_args()
+
+    items = get_items(options.items)
+    serializers = [('legacy json', LegacySerializer())]
+    for name in SERIALIZERS:
+        try:
+            serializers.append((name, get_serializer(name)))
+        except Exception as e:
+            print('%s: skipped (%s)' % (name, e))
+
+    print('%-12s %12s %12s %10s' % (
+        'serializer', 'encode, us', 'decode, us', 'size, b'))
+    for name, serializer in serializers:
+        data = serializer.dumps(items)
+        encode = timeit.timeit(
+            lambda: serializer.dumps(items), number=options.number)
+        decode = timeit.timeit(
+            lambda: serializer.loads(data), number=options.number)
+        size = len(data.encode('utf-8') if isinstance(data, str) else data)
+        print('%-12s %12.1f %12.1f %10d' % (
+            name, encode / options.number * 10 ** 6,
+            decode / options.number * 10 ** 6, size))
+
+
+if __name__ == '__main__':
+    main()
@@ -23,6 +23,10 @@ setup(
     author='trashnroll',
     author_email='trashnroll@gmail.com',
     install_requires=DEPENDENCIES,
+    extras_require={
+        'orjson': ['orjson'],
+        'msgpack': ['msgpack'],
+    },
     dependency_links=DEPENDENCY_LINKS,
     setup_requires=[],
     license='MIT',